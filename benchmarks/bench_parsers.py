@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Parser benchmark on saved pages in benchmarks/fixtures.
+Compares the original per-link get_text extraction with the current
+single-pass one for every available BeautifulSoup backend, and checks that
+all of them return exactly the same jobs. Then times the keyword filter on
+the parsed jobs against the original substring check.
+
+Run from the repo root:
+  python benchmarks/bench_parsers.py [--repeat 5]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from config import DESIGN_KEYWORDS  # noqa: E402
+from jobs_scraper import DESIGN_MATCHER, design_score, scrape_generic, scrape_wise_jobs  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+CASES = [
+    ("wise_jobs.html", "https://wise.jobs/jobs", scrape_wise_jobs),
+    ("generic_careers.html", "https://example.com/careers", scrape_generic),
+]
+
+
+def legacy_scrape_generic(html: str, base_url: str) -> list[dict]:
+    """scrape_generic as it was before single-pass extraction (reference; keywords are now matched per subscriber, later)."""
+    soup = BeautifulSoup(html, "html.parser")
+    jobs = []
+    for a in soup.find_all("a", href=True):
+        href = a.get("href", "")
+        if not href or href.startswith("#") or "javascript:" in href:
+            continue
+        full_url = urljoin(base_url, href)
+        parsed = urlparse(full_url)
+        if parsed.path in ("/", "") or any(x in parsed.path for x in ("/login", "/sign-in", "/blog", "/posts")):
+            continue
+        title = (a.get_text(strip=True) or "").strip()
+        if len(title) < 5 or len(title) > 300:
+            continue
+        parent = a.find_parent(["article", "div", "li", "section"])
+        jobs.append({
+            "url": full_url,
+            "title": title,
+            "team": "",
+            "company": parsed.netloc.replace("www.", "").split(".")[0] or "Company",
+            "description": (parent.get_text(separator=" ", strip=True)[:500] if parent else title),
+        })
+    seen_urls = set()
+    out = []
+    for j in jobs:
+        if j["url"] not in seen_urls:
+            seen_urls.add(j["url"])
+            out.append(j)
+    return out
+
+
+def legacy_scrape_wise_jobs(html: str, base_url: str) -> list[dict]:
+    """scrape_wise_jobs as it was before single-pass extraction (reference)."""
+    soup = BeautifulSoup(html, "html.parser")
+    jobs = []
+    for a in soup.find_all("a", href=re.compile(r"/job/[-a-z0-9]+-jid-\d+")):
+        href = a.get("href")
+        if not href:
+            continue
+        job_url = urljoin(base_url, href)
+        title = (a.get_text(strip=True) or "").strip()
+        if not title or len(title) > 200:
+            continue
+        card = a.find_parent(["article", "div", "li"])
+        team = ""
+        desc = ""
+        if card:
+            card_text = card.get_text(separator=" ", strip=True)
+            team_m = re.search(r"Team\s*[:\s]+(\w+)", card_text, re.I)
+            if team_m:
+                team = team_m.group(1)
+            desc_m = re.search(r"Description\s*([^\n]+)", card_text, re.I | re.DOTALL)
+            if desc_m:
+                desc = desc_m.group(1)[:500].strip()
+        jobs.append({
+            "url": job_url,
+            "title": title,
+            "team": team,
+            "company": "Wise",
+            "description": desc or title,
+        })
+    seen_urls = set()
+    out = []
+    for j in jobs:
+        if j["url"] not in seen_urls:
+            seen_urls.add(j["url"])
+            out.append(j)
+    return out
+
+
+LEGACY = {scrape_generic: legacy_scrape_generic, scrape_wise_jobs: legacy_scrape_wise_jobs}
+
+
+def legacy_matches(job: dict) -> bool:
+    """Keyword filter as it was before the matcher: a substring test per keyword (reference)."""
+    text = " ".join(str(job.get(k, "")) for k in ("title", "team", "company", "description")).lower()
+    return any(kw in text for kw in DESIGN_KEYWORDS)
+
+
+def bench_matcher(jobs: list[dict], repeat: int) -> None:
+    if not jobs:
+        return
+    base_time, _ = best_of(lambda: [legacy_matches(j) for j in jobs], repeat)
+    t, scores = best_of(lambda: [design_score(j) for j in jobs], repeat)
+    matched = sum(s >= DESIGN_MATCHER.min_score for s in scores)
+    print(f"  {'keywords/substring':<24}{base_time / len(jobs) * 1e6:9.1f} us/job")
+    print(f"  {'keywords/matcher':<24}{t / len(jobs) * 1e6:9.1f} us/job  {matched} of {len(jobs)} match")
+
+
+def available_backends() -> list[str]:
+    backends = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    return backends
+
+
+def best_of(fn, repeat: int) -> tuple[float, list[dict]]:
+    best = float("inf")
+    result = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    ok = True
+    for name, base_url, scraper in CASES:
+        html = (FIXTURES / name).read_text(encoding="utf-8")
+        base_time, expected = best_of(lambda: LEGACY[scraper](html, base_url), args.repeat)
+        print(f"{name} ({len(html) // 1024} KB, {len(expected)} jobs)")
+        print(f"  {'legacy/html.parser':<24}{base_time * 1000:9.1f} ms")
+        for backend in available_backends():
+            t, jobs = best_of(lambda: scraper(html, base_url, parser=backend), args.repeat)
+            same = jobs == expected
+            ok &= same
+            print(
+                f"  {'single-pass/' + backend:<24}{t * 1000:9.1f} ms"
+                f"  x{base_time / t:5.1f}  {'same output' if same else 'OUTPUT DIFFERS'}"
+            )
+        bench_matcher(expected, args.repeat)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
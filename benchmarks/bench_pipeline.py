@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the scrape -> filter -> generate -> send pipeline.
+A local stub server stands in for the job boards (the recorded pages in
+benchmarks/fixtures plus generated detail pages), the Yandex completion
+endpoint (configurable latency and share of 429s) and the Telegram Bot API.
+Every stage runs in its own process with a throwaway DATA_DIR, so nothing
+touches live services or data/, and peak memory is per stage.
+
+Stages:
+  scrape_generic  parse N board pages (no network)
+  get_new_jobs    fetch, parse, filter, dedupe and enrich N boards
+  run_daily_send  the whole daily run: N boards shared by --chats chats,
+                  --letters letters per chat, the rest sent as job lists
+
+Run from the repo root:
+  python benchmarks/bench_pipeline.py [--boards 10,100,1000] [--llm-latency 0.3] [--llm-429 0.1]
+
+Every board is served from one stub host, so the per-host politeness limits
+are lifted for the run; job links are shared between boards, so the number of
+distinct postings (and letters) does not grow with the number of boards.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+BOARD_FIXTURES = ["wise_jobs.html", "generic_careers.html"]
+STAGES = ["scrape_generic", "get_new_jobs", "run_daily_send"]
+BOT_TOKEN = "123456:bench"
+
+_BOARD_RE = re.compile(r"^/b(\d+)/?$")
+_DETAIL_PAGE = """<!doctype html><html><head><title>{title}</title>
+<script type="application/ld+json">{ld}</script></head>
+<body><main><h1>{title}</h1><p>{text}</p></main></body></html>"""
+_LETTER = (
+    "I lead brand and product design teams and would like to bring that experience to your role. "
+    "At Yandex Practicum I launched a new visual system and cut banner time-to-market from days to minutes. "
+    "I would be glad to talk about how I can help your team ship faster."
+)
+
+
+class StubServer:
+    """Boards, Yandex completions and the Telegram Bot API on one local port."""
+
+    def __init__(self, llm_latency: float, llm_429: float, tg_latency: float, tg_429: float, retry_after: int):
+        self.llm_latency = llm_latency
+        self.llm_429 = llm_429
+        self.tg_latency = tg_latency
+        self.tg_429 = tg_429
+        self.retry_after = retry_after
+        self.pages = [(FIXTURES / name).read_bytes() for name in BOARD_FIXTURES]
+        self.etags = [hashlib.md5(page).hexdigest() for page in self.pages]
+        self.counts: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.message_id = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def start(self) -> None:
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status: int, data: dict, headers: dict | None = None):
+                self._reply(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                m = _BOARD_RE.match(path)
+                if m:
+                    i = int(m.group(1)) % len(stub.pages)
+                    etag = f'"{stub.etags[i]}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        stub.count("board 304")
+                        return self._reply(304, b"", "text/html", {"ETag": etag})
+                    stub.count("board")
+                    return self._reply(200, stub.pages[i], "text/html; charset=utf-8", {"ETag": etag})
+                if path.startswith(("/careers/", "/job/")):
+                    stub.count("detail")
+                    return self._reply(200, stub.detail_page(path), "text/html; charset=utf-8")
+                self._reply(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if path.startswith("/foundationModels/"):
+                    return self._completion()
+                if path.startswith("/bot"):
+                    return self._telegram(path.rsplit("/", 1)[-1], body)
+                self._reply(404, b"not found", "text/plain")
+
+            def _completion(self):
+                if random.random() < stub.llm_429:
+                    stub.count("llm 429")
+                    return self._json(429, {"error": "rate limited"}, {"Retry-After": str(stub.retry_after)})
+                time.sleep(stub.llm_latency * random.uniform(0.5, 1.5))
+                stub.count("llm")
+                self._json(200, {"result": {
+                    "alternatives": [{"message": {"role": "assistant", "text": _LETTER}, "status": "ALTERNATIVE_STATUS_FINAL"}],
+                    "usage": {"inputTextTokens": "1500", "completionTokens": "120", "totalTokens": "1620"},
+                }})
+
+            def _telegram(self, method: str, body: bytes):
+                if method == "getMe":
+                    return self._json(200, {"ok": True, "result": {
+                        "id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                    }})
+                if random.random() < stub.tg_429:
+                    stub.count("telegram 429")
+                    return self._json(429, {
+                        "ok": False, "error_code": 429,
+                        "description": f"Too Many Requests: retry after {stub.retry_after}",
+                        "parameters": {"retry_after": stub.retry_after},
+                    })
+                time.sleep(stub.tg_latency)
+                params = _form_or_json(body, self.headers.get("Content-Type", ""))
+                stub.count(f"telegram {method}")
+                with stub.lock:
+                    stub.message_id += 1
+                    message_id = stub.message_id
+                self._json(200, {"ok": True, "result": {
+                    "message_id": int(params.get("message_id") or message_id),
+                    "date": int(time.time()),
+                    "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                    "text": params.get("text", ""),
+                }})
+
+        return Handler
+
+    def detail_page(self, path: str) -> bytes:
+        slug = path.rstrip("/").rsplit("/", 1)[-1]
+        title = slug.replace("-", " ").title()
+        text = (
+            f"As {title} you will own the visual language of our product and campaigns. "
+            "You have 5+ years of experience in brand and product design and a strong portfolio. "
+        ) * 6
+        ld = {
+            "@context": "https://schema.org", "@type": "JobPosting", "title": title, "description": text,
+            "jobLocation": {"@type": "Place", "address": {"addressLocality": "London", "addressCountry": "UK"}},
+            "baseSalary": {"currency": "GBP", "value": {"minValue": 60000, "maxValue": 80000, "unitText": "YEAR"}},
+        }
+        return _DETAIL_PAGE.format(title=title, ld=json.dumps(ld), text=text).encode("utf-8")
+
+
+def _form_or_json(body: bytes, content_type: str) -> dict:
+    if "json" in content_type:
+        try:
+            return json.loads(body or b"{}")
+        except ValueError:
+            return {}
+    return {k: v[0] for k, v in parse_qs(body.decode("utf-8", "replace")).items()}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> float:
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+# --- child process: one stage at one scale ---------------------------------
+
+
+def _timed(fn, samples: list):
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - t0)
+    return wrapper
+
+
+def _timed_async(fn, samples: list):
+    async def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - t0)
+    return wrapper
+
+
+def run_stage(stage: str, boards: int, stub_url: str, chats: int, tg_interval: float) -> dict:
+    sys.path.insert(0, str(ROOT))
+    import jobs_scraper
+    import outbox
+    import yandex_gpt
+
+    baseline = peak_rss_mb()
+    urls = [f"{stub_url}/b{i}/" for i in range(boards)]
+    samples: dict[str, list[float]] = {}
+    items: dict[str, int] = {}
+    t0 = time.perf_counter()
+
+    if stage == "scrape_generic":
+        pages = [(FIXTURES / name).read_text(encoding="utf-8") for name in BOARD_FIXTURES]
+        parse = _timed(jobs_scraper.scrape_generic, samples.setdefault("parse", []))
+        items["jobs"] = sum(len(parse(pages[i % len(pages)], url)) for i, url in enumerate(urls))
+        items["parse"] = boards
+
+    elif stage == "get_new_jobs":
+        jobs_scraper.fetch_board_jobs = _timed(jobs_scraper.fetch_board_jobs, samples.setdefault("fetch", []))
+        items["jobs"] = len(jobs_scraper.get_new_jobs(urls))
+        items["fetch"] = boards
+
+    elif stage == "run_daily_send":
+        import telegram_bot
+        from subscriptions import Subscription, save_subscriptions
+
+        # Telegram's pacing (1 message/s per chat) would dominate the run; the stub has no flood limit
+        outbox.CHAT_INTERVAL = tg_interval
+        outbox.GLOBAL_INTERVAL = tg_interval / 30
+        jobs_scraper.fetch_board_jobs = _timed(jobs_scraper.fetch_board_jobs, samples.setdefault("fetch", []))
+        yandex_gpt.generate_cover_letter = _timed(yandex_gpt.generate_cover_letter, samples.setdefault("letter", []))
+        outbox.TelegramSender.send = _timed_async(outbox.TelegramSender.send, samples.setdefault("send", []))
+        chats = max(1, min(chats, boards))
+        save_subscriptions({
+            chat_id: Subscription(chat_id=chat_id, urls=urls[i::chats], scope=str(chat_id))
+            for i, chat_id in enumerate(range(1000, 1000 + chats))
+        })
+        telegram_bot.run_daily_send(BOT_TOKEN)
+        items.update({k: len(v) for k, v in samples.items()})
+
+    return {
+        "stage": stage,
+        "boards": boards,
+        "wall": time.perf_counter() - t0,
+        "items": items,
+        "samples": samples,
+        "peak_mb": peak_rss_mb(),
+        "baseline_mb": baseline,
+    }
+
+
+# --- parent: stub server, one process per stage ------------------------------
+
+
+def run_child(args, stage: str, boards: int, stub_url: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-data-") as data_dir:
+        env = dict(
+            os.environ,
+            DATA_DIR=data_dir,
+            YANDEX_LLM_API_URL=stub_url,
+            TELEGRAM_API_URL=f"{stub_url}/bot",
+            YANDEX_API_KEY="bench",
+            YANDEX_IAM_TOKEN="",
+            FETCH_HOST_RATE="10000",
+            FETCH_HOST_BURST="10000",
+            FETCH_PER_HOST_CONCURRENCY=os.environ.get("FETCH_CONCURRENCY", "32"),
+            BREAKER_FAILURES="0",
+            LETTERS_PER_DAY=str(args.letters),
+            LLM_MAX_RETRIES="6",
+        )
+        cmd = [
+            sys.executable, str(Path(__file__).resolve()), "--child", stage, str(boards),
+            "--stub-url", stub_url, "--chats", str(args.chats), "--tg-interval", str(args.tg_interval),
+        ]
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{stage} at {boards} boards failed:\n{proc.stderr[-4000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def print_result(result: dict) -> None:
+    stage, boards, wall = result["stage"], result["boards"], result["wall"]
+    memory = f"{result['peak_mb']:7.0f} MB (+{result['peak_mb'] - result['baseline_mb']:.0f})"
+    extra = f"  {result['items']['jobs']} jobs" if "jobs" in result["items"] else ""
+    print(f"{boards:>6}  {stage:<15} {'total':<7}{wall:9.2f} s{'':>23}{memory}{extra}")
+    for name, values in result["samples"].items():
+        n = len(values)
+        rate = n / wall if wall else 0.0
+        print(
+            f"{'':>6}  {'':<15} {name:<7}{n:>6} x {rate:8.1f}/s"
+            f"  p50 {percentile(values, 50) * 1000:8.1f} ms  p95 {percentile(values, 95) * 1000:8.1f} ms"
+        )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--boards", default="10,100,1000", help="comma-separated board counts")
+    ap.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages")
+    ap.add_argument("--chats", type=int, default=5, help="subscribed chats in run_daily_send")
+    ap.add_argument("--letters", type=int, default=5, help="LETTERS_PER_DAY in run_daily_send")
+    ap.add_argument("--llm-latency", type=float, default=0.3, help="mean seconds per completion")
+    ap.add_argument("--llm-429", type=float, default=0.1, help="share of completions answered 429")
+    ap.add_argument("--tg-latency", type=float, default=0.02, help="seconds per Telegram call")
+    ap.add_argument("--tg-429", type=float, default=0.02, help="share of Telegram calls answered 429")
+    ap.add_argument("--retry-after", type=int, default=1, help="seconds the stub asks to wait after a 429")
+    ap.add_argument("--tg-interval", type=float, default=0.0, help="seconds between messages to one chat")
+    ap.add_argument("--child", nargs=2, metavar=("STAGE", "BOARDS"), help=argparse.SUPPRESS)
+    ap.add_argument("--stub-url", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        stage, boards = args.child
+        print(json.dumps(run_stage(stage, int(boards), args.stub_url, args.chats, args.tg_interval)))
+        return 0
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    stub = StubServer(args.llm_latency, args.llm_429, args.tg_latency, args.tg_429, args.retry_after)
+    stub.start()
+    try:
+        for boards in (int(b) for b in args.boards.split(",") if b):
+            for stage in stages:
+                print_result(run_child(args, stage, boards, stub.url))
+    finally:
+        stub.stop()
+    print("stub:", ", ".join(f"{k} {v}" for k, v in sorted(stub.counts.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
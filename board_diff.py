@@ -0,0 +1,58 @@
+"""
+Per-board diffs: each parsed job card gets a content hash, and a board's jobs
+are compared with the previous run's snapshot to report postings that were
+added, removed (closed) or changed (updated).
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+from job_dedupe import canonical_url
+
+CARD_FIELDS = ("title", "team", "company", "description")
+
+
+def card_key(job: dict) -> str:
+    return canonical_url(job.get("url", "")) or job.get("title", "")
+
+
+def card_hash(job: dict) -> str:
+    """Hash of the fields a subscriber sees; the URL is the card's key, not part of its content."""
+    text = "\x1f".join(str(job.get(f, "")) for f in CARD_FIELDS)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class BoardDiff:
+    added: list[dict] = field(default_factory=list)
+    removed: list[dict] = field(default_factory=list)
+    changed: list[dict] = field(default_factory=list)
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        return f"+{len(self.added)} -{len(self.removed)} ~{len(self.changed)} ={self.unchanged}"
+
+
+def diff_jobs(previous: list[dict], current: list[dict]) -> BoardDiff:
+    """Compare a board's jobs with the snapshot of its previous run."""
+    before = {}
+    for job in previous:
+        before.setdefault(card_key(job), job)
+    diff = BoardDiff()
+    keys = set()
+    for job in current:
+        key = card_key(job)
+        if key in keys:
+            continue
+        keys.add(key)
+        old = before.get(key)
+        if old is None:
+            diff.added.append(job)
+        elif card_hash(old) != card_hash(job):
+            diff.changed.append(job)
+        else:
+            diff.unchanged += 1
+    diff.removed = [job for key, job in before.items() if key not in keys]
+    return diff
@@ -0,0 +1,213 @@
+"""
+Daemon mode: the bot process also polls every subscribed board on its own
+schedule, so new postings arrive within minutes instead of once a day.
+A board's interval drops back to the base interval when its postings change
+and grows while they do not; jitter keeps boards from firing together. The page
+cache, pooled sessions and the bot stay warm in memory; the page cache, host
+health, the schedule and the run report are checkpointed to DATA_DIR.
+New jobs go to the outbox as soon as they are selected; every
+DAEMON_FLUSH_MINUTES, chats with jobs or messages still waiting there are
+delivered again.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Awaitable, Callable
+
+from config import (
+    BOARD_SCHEDULE_JSON,
+    DAEMON_BOARD_INTERVAL_MINUTES,
+    DAEMON_MAX_INTERVAL_MINUTES,
+    DAEMON_JITTER,
+    DAEMON_CHECKPOINT_MINUTES,
+    DAEMON_FLUSH_MINUTES,
+    ensure_data_dir,
+)
+from fetch_scheduler import fetch_scheduler
+from jobs_scraper import (
+    load_page_cache,
+    save_page_cache,
+    scrape_boards,
+    select_new_jobs,
+)
+from metrics import metrics
+from outbox import Outbox
+from subscriptions import Subscription, load_subscriptions
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 30.0  # how often due boards are looked for
+BACKOFF_FACTOR = 1.5  # interval growth after an unchanged fetch
+
+
+class BoardScheduler:
+    """
+    deliver(sub) writes letters for and sends what waits in one chat's outbox;
+    busy(chat_id) tells if the chat has a /check in flight. Jobs found for a
+    busy chat, or one whose previous delivery is still running, wait in the
+    outbox for the next delivery or flush.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[Subscription], Awaitable[None]],
+        busy: Callable[[int], bool] = lambda chat_id: False,
+        interval: float = DAEMON_BOARD_INTERVAL_MINUTES * 60,
+        max_interval: float = DAEMON_MAX_INTERVAL_MINUTES * 60,
+        jitter: float = DAEMON_JITTER,
+        checkpoint_every: float = DAEMON_CHECKPOINT_MINUTES * 60,
+        flush_every: float = DAEMON_FLUSH_MINUTES * 60,
+        path=BOARD_SCHEDULE_JSON,
+    ):
+        self.deliver = deliver
+        self.busy = busy
+        self.interval = max(60.0, interval)
+        self.max_interval = max(self.interval, max_interval)
+        self.jitter = min(max(jitter, 0.0), 0.9)
+        self.checkpoint_every = checkpoint_every
+        self.flush_every = flush_every
+        self.path = path
+        self.boards = self._load()  # url -> {"interval", "next_due"} (wall clock)
+        self.page_cache = load_page_cache()
+        self.last_checkpoint = time.monotonic()
+        self.last_flush = time.monotonic()
+        self._deliveries: dict[int, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return dict(json.loads(self.path.read_text(encoding="utf-8")).get("boards", {}))
+        except Exception:
+            return {}
+
+    def checkpoint(self) -> None:
+        ensure_data_dir()
+        save_page_cache(self.page_cache)
+        fetch_scheduler.breaker.save()
+        self.path.write_text(json.dumps({"boards": self.boards}, indent=2, sort_keys=True), encoding="utf-8")
+        metrics.write_report()
+        self.last_checkpoint = time.monotonic()
+
+    def _next_due(self, interval: float, now: float) -> float:
+        return now + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def due(self, urls, now: float | None = None) -> list[str]:
+        """Boards whose time has come. New boards are due at once; boards no one follows are forgotten."""
+        now = time.time() if now is None else now
+        urls = set(urls)
+        for url in list(self.boards):
+            if url not in urls:
+                del self.boards[url]
+                self.page_cache.pop(url, None)
+        for url in urls:
+            self.boards.setdefault(url, {"interval": self.interval, "next_due": now})
+        return sorted(u for u, b in self.boards.items() if b["next_due"] <= now)
+
+    def reschedule(self, url: str, changed: bool, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        board = self.boards.setdefault(url, {"interval": self.interval, "next_due": now})
+        if changed:
+            board["interval"] = self.interval
+        else:
+            board["interval"] = min(self.max_interval, board["interval"] * BACKOFF_FACTOR)
+        board["next_due"] = self._next_due(board["interval"], now)
+
+    async def run_once(self) -> int:
+        """Fetch due boards and hand new jobs to their chats. Returns the number of boards fetched."""
+        subs = [s for s in load_subscriptions().values() if s.urls]
+        due = self.due(u for s in subs for u in s.urls)
+        if not due:
+            return 0
+        diffs = {}
+        by_url = await scrape_boards(due, page_cache=self.page_cache, diffs=diffs)
+        for url in due:
+            diff = diffs.get(url)
+            if diff:
+                logger.info("%s: %s", url, diff.summary())
+            # Job changes count, not page bytes: nonces and timestamps do not shorten the interval
+            self.reschedule(url, changed=bool(diff))
+        for sub in await asyncio.to_thread(self._store_new_jobs, subs, by_url):
+            self._hand_over(sub)
+        return len(due)
+
+    @staticmethod
+    def _store_new_jobs(subs: list[Subscription], by_url: dict[str, list[dict]]) -> list[Subscription]:
+        """
+        Select each chat's new jobs and put them in the outbox; runs in a
+        worker thread. Returns the subscriptions that got any.
+        """
+        got_jobs = []
+        with Outbox() as outbox:
+            for sub in subs:
+                urls = [u for u in sub.urls if u in by_url]
+                if not urls:
+                    continue
+                # Stored in the same step that marks them seen; details are fetched on delivery
+                jobs = select_new_jobs(urls, by_url, sub.matcher(), sub.scope)
+                if jobs:
+                    outbox.add_jobs(sub.chat_id, jobs)
+                    got_jobs.append(sub)
+        return got_jobs
+
+    def flush(self) -> int:
+        """Start a delivery for every chat with something waiting in the outbox. Returns how many started."""
+        with Outbox() as outbox:
+            pending = outbox.pending_chats()
+        subs = load_subscriptions()
+        return sum(self._hand_over(subs[chat_id]) for chat_id in pending if chat_id in subs)
+
+    def _hand_over(self, sub: Subscription) -> bool:
+        """Deliver the chat's outbox now, unless a /check or an earlier delivery is on it."""
+        running = self._deliveries.get(sub.chat_id)
+        if self.busy(sub.chat_id) or (running is not None and not running.done()):
+            return False
+        task = asyncio.create_task(self.deliver(sub))
+        task.add_done_callback(self._delivery_done)
+        self._deliveries[sub.chat_id] = task
+        return True
+
+    @staticmethod
+    def _delivery_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Scheduled delivery failed", exc_info=task.exception())
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                fetched = await self.run_once()
+                if fetched:
+                    logger.info("Checked %d boards", fetched)
+            except Exception:
+                logger.exception("Scheduled check failed")
+            if time.monotonic() - self.last_flush >= self.flush_every:
+                self.last_flush = time.monotonic()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Outbox flush failed")
+            if time.monotonic() - self.last_checkpoint >= self.checkpoint_every:
+                # Next try in checkpoint_every even if this one fails
+                self.last_checkpoint = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.checkpoint)
+                except Exception:
+                    logger.exception("Checkpoint failed")
+            await asyncio.sleep(TICK_SECONDS)
+
+    def start(self) -> None:
+        """Start polling on the running loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._task, *self._deliveries.values()] if t is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._deliveries = {}
+        self.checkpoint()
@@ -0,0 +1,111 @@
+"""
+Background queue for /check: runs are handled by worker tasks so the bot
+keeps answering commands, progress is shown by editing one status message,
+runs can be cancelled, and a /check for a chat that already has a run
+queued or in flight is coalesced into it.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from config import CHECK_WORKERS
+
+logger = logging.getLogger(__name__)
+
+STATUS_EDIT_INTERVAL = 2.0  # seconds between edits of the status message
+
+
+@dataclass
+class CheckRun:
+    chat_id: int
+    bot: Any
+    status_message: Any
+    status: str = ""
+    shown: str = ""
+    task: asyncio.Task | None = None
+    started: float = field(default_factory=time.monotonic)
+
+    def set_status(self, text: str) -> None:
+        """Cheap to call often: the message is edited at most every STATUS_EDIT_INTERVAL."""
+        self.status = text
+
+    async def flush_status(self) -> None:
+        if not self.status or self.status == self.shown:
+            return
+        text = self.status
+        try:
+            await self.status_message.edit_text(text)
+            self.shown = text
+        except Exception as e:
+            # "message is not modified", flood limits: the next edit will catch up
+            logger.debug("Status edit failed: %s", e)
+
+
+class CheckQueue:
+    def __init__(self, handler: Callable[[CheckRun], Awaitable[None]], workers: int = CHECK_WORKERS):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue[CheckRun] = asyncio.Queue()
+        self.runs: dict[int, CheckRun] = {}  # queued or running, by chat
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start worker tasks on the running loop."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for chat_id in list(self.runs):
+            self.cancel(chat_id)
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def busy(self, chat_id: int) -> bool:
+        return chat_id in self.runs
+
+    def submit(self, run: CheckRun) -> bool:
+        """Queue a run; False if the chat already has one queued or in flight."""
+        if run.chat_id in self.runs:
+            return False
+        self.runs[run.chat_id] = run
+        self.queue.put_nowait(run)
+        return True
+
+    def cancel(self, chat_id: int) -> bool:
+        run = self.runs.pop(chat_id, None)
+        if run is None:
+            return False
+        if run.task is not None:
+            run.task.cancel()
+        return True
+
+    async def _ticker(self, run: CheckRun) -> None:
+        while True:
+            await asyncio.sleep(STATUS_EDIT_INTERVAL)
+            await run.flush_status()
+
+    async def _worker(self) -> None:
+        while True:
+            run = await self.queue.get()
+            try:
+                if self.runs.get(run.chat_id) is not run:
+                    continue  # cancelled while queued
+                run.task = asyncio.create_task(self.handler(run))
+                ticker = asyncio.create_task(self._ticker(run))
+                # wait() instead of await: cancelling the run must not cancel the worker
+                await asyncio.wait({run.task})
+                ticker.cancel()
+                if run.task.cancelled():
+                    run.set_status("Проверка остановлена.")
+                elif run.task.exception() is not None:
+                    logger.error("Check failed", exc_info=run.task.exception())
+                    run.set_status(f"Ошибка при проверке: {run.task.exception()}")
+                await run.flush_status()
+            finally:
+                if self.runs.get(run.chat_id) is run:
+                    del self.runs[run.chat_id]
+                self.queue.task_done()
@@ -2,11 +2,24 @@ import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
+# State and caches; DATA_DIR overrides it (benchmarks run against a throwaway directory)
+DATA_DIR = Path(os.environ.get("DATA_DIR") or BASE_DIR / "data")
 PROFILE_PATH = BASE_DIR / "profile.txt"
 INSTRUCTION_PATH = BASE_DIR / "cover_letter_instruction.txt"
-URLS_JSON = DATA_DIR / "urls.json"
-SEEN_JOBS_JSON = DATA_DIR / "seen_jobs.json"
+URLS_JSON = DATA_DIR / "urls.json"  # single-user board list, see subscriptions.py
+SUBSCRIPTIONS_JSON = DATA_DIR / "subscriptions.json"
+PROFILES_DIR = DATA_DIR / "profiles"
+SEEN_JOBS_JSON = DATA_DIR / "seen_jobs.json"  # legacy, imported into SEEN_DB once
+SEEN_DB = DATA_DIR / "seen_jobs.sqlite3"
+# Postings not seen on any board for this many days are forgotten (0 = keep forever)
+SEEN_TTL_DAYS = int(os.environ.get("SEEN_TTL_DAYS", "180"))
+PAGE_CACHE_JSON = DATA_DIR / "page_cache.json"
+LETTER_CACHE_DB = DATA_DIR / "letter_cache.sqlite3"
+HOST_HEALTH_JSON = DATA_DIR / "host_health.json"
+OUTBOX_DB = DATA_DIR / "outbox.sqlite3"
+JOB_DETAILS_DB = DATA_DIR / "job_details.sqlite3"
+BOARD_SCHEDULE_JSON = DATA_DIR / "board_schedule.json"
+RUN_REPORT_JSON = DATA_DIR / "run_report.json"  # timings and counters of the last run, see metrics.py
 RESUME_PDF_URL = "https://danyavidmich.com/cv_vidmich_designer.pdf"
 
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
@@ -14,11 +27,101 @@ YANDEX_API_KEY = os.environ.get("YANDEX_API_KEY", "")
 YANDEX_IAM_TOKEN = os.environ.get("YANDEX_IAM_TOKEN", "")
 YANDEX_FOLDER_ID = os.environ.get("YANDEX_FOLDER_ID", "b1g6rst3sps7hhu8tqla")
 YANDEX_MODEL_URI = os.environ.get("YANDEX_MODEL_URI", "gpt://b1g6rst3sps7hhu8tqla/aliceai-llm/latest")
+# API endpoints; overridden only to point at stub servers (benchmarks/bench_pipeline.py)
+YANDEX_LLM_API_URL = os.environ.get("YANDEX_LLM_API_URL", "https://llm.api.cloud.yandex.net").rstrip("/")
+# Deferred completions (LLM_ASYNC) are polled here; a stub set in YANDEX_LLM_API_URL serves both by default
+YANDEX_OPERATION_API_URL = os.environ.get(
+    "YANDEX_OPERATION_API_URL",
+    YANDEX_LLM_API_URL if "YANDEX_LLM_API_URL" in os.environ else "https://operation.api.cloud.yandex.net",
+).rstrip("/")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Fetching: total boards in flight and boards in flight per host
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "32"))
+FETCH_PER_HOST_CONCURRENCY = int(os.environ.get("FETCH_PER_HOST_CONCURRENCY", "4"))
+# Politeness: requests per second per host (bursts up to FETCH_HOST_BURST), retries on 429/5xx/timeouts
+FETCH_HOST_RATE = float(os.environ.get("FETCH_HOST_RATE", "1.0"))
+FETCH_HOST_BURST = float(os.environ.get("FETCH_HOST_BURST", "4"))
+FETCH_MAX_RETRIES = int(os.environ.get("FETCH_MAX_RETRIES", "2"))
+# Circuit breaker: skip a host for the cool-down after this many failed fetches in a row (0 = off)
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_HOURS = float(os.environ.get("BREAKER_COOLDOWN_HOURS", "6"))
+# Paginated boards: pages per board (1 = first page only), queued page links, pages fetched at once.
+# A page with only known jobs stops the crawl, except in a full crawl every CRAWL_FULL_HOURS
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", "10"))
+CRAWL_MAX_FRONTIER = int(os.environ.get("CRAWL_MAX_FRONTIER", "30"))
+CRAWL_CONCURRENCY = int(os.environ.get("CRAWL_CONCURRENCY", "4"))
+CRAWL_FULL_HOURS = float(os.environ.get("CRAWL_FULL_HOURS", "24"))
+# Detail pages of new matching jobs: fetched at once (0 = off), skipped when the listing already
+# has a description this long, cached for DETAILS_CACHE_DAYS
+ENRICH_CONCURRENCY = int(os.environ.get("ENRICH_CONCURRENCY", "8"))
+ENRICH_MIN_DESCRIPTION = int(os.environ.get("ENRICH_MIN_DESCRIPTION", "800"))
+DETAILS_CACHE_DAYS = float(os.environ.get("DETAILS_CACHE_DAYS", "30"))
+# Bot: /check runs processed at the same time (one per chat)
+CHECK_WORKERS = int(os.environ.get("CHECK_WORKERS", "2"))
+# Daemon mode (telegram_bot.py --daemon): each board is polled every BASE..MAX minutes,
+# the interval grows while the page is unchanged; +-JITTER spreads boards out
+DAEMON_BOARD_INTERVAL_MINUTES = float(os.environ.get("DAEMON_BOARD_INTERVAL_MINUTES", "30"))
+DAEMON_MAX_INTERVAL_MINUTES = float(os.environ.get("DAEMON_MAX_INTERVAL_MINUTES", "360"))
+DAEMON_JITTER = float(os.environ.get("DAEMON_JITTER", "0.2"))
+# How often the page cache, host health and board schedule are written to DATA_DIR
+DAEMON_CHECKPOINT_MINUTES = float(os.environ.get("DAEMON_CHECKPOINT_MINUTES", "5"))
+# How often the daemon delivers what waits in the outbox (jobs parked for a busy chat, failed sends)
+DAEMON_FLUSH_MINUTES = float(os.environ.get("DAEMON_FLUSH_MINUTES", "5"))
+# Prometheus text endpoint (GET /metrics) in daemon mode; 0 = off
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_ADDR = os.environ.get("METRICS_ADDR", "127.0.0.1")
+
+# Telegram outbox: merge vacancies into digest messages, give up on a message after N failed sends
+OUTBOX_DIGEST = os.environ.get("OUTBOX_DIGEST", "").strip().lower() in ("1", "true", "yes")
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "5"))
+# Cover letters per chat per day (0 = no limit): new jobs are ranked against the profile,
+# the best ones get letters, the rest are sent as one list of titles and links
+LETTERS_PER_DAY = int(os.environ.get("LETTERS_PER_DAY", "0"))
+
+# Shared HTTP pools: hosts kept per session, keep-alive connections per host
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", "64"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+
+# BeautifulSoup backend: "auto" uses lxml when it is installed, else html.parser
+HTML_PARSER = os.environ.get("HTML_PARSER", "auto")
+# Pages of at least PARSE_POOL_MIN_BYTES are parsed in PARSE_PROCESSES worker processes
+# (0 = one per core, 1 = no pool: parse in the fetching thread)
+PARSE_PROCESSES = int(os.environ.get("PARSE_PROCESSES", "0"))
+PARSE_POOL_MIN_BYTES = int(os.environ.get("PARSE_POOL_MIN_BYTES", str(128 * 1024)))
+
+# Cover letters: completions in flight, token budget per minute (0 = no limit), retries on 429/5xx
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "4"))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+# Stream letters into Telegram as they are written (/check and daemon mode, not digests)
+LLM_STREAM = os.environ.get("LLM_STREAM", "1").strip().lower() in ("1", "true", "yes")
+# Deferred completions (completionAsync): a batch is submitted at once and polled; slower per
+# letter, but no connection is held while it is written. Not used when streaming.
+LLM_ASYNC = os.environ.get("LLM_ASYNC", "").strip().lower() in ("1", "true", "yes")
+LLM_POLL_SECONDS = float(os.environ.get("LLM_POLL_SECONDS", "2"))
+# Prompt size: profile characters per letter (longer profiles are sent as a cached digest plus
+# the sections that match the job; 0 = whole profile) and job description characters
+PROMPT_PROFILE_CHARS = int(os.environ.get("PROMPT_PROFILE_CHARS", "3000"))
+PROMPT_DESCRIPTION_CHARS = int(os.environ.get("PROMPT_DESCRIPTION_CHARS", "1500"))
+# Generated letters kept for reuse, least recently used dropped first (0 = no cache)
+LETTER_CACHE_MAX_BYTES = int(os.environ.get("LETTER_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
 
 DESIGN_KEYWORDS = [
     "design", "product design", "graphic design", "ux", "ui", "brand",
     "creative", "art director", "visual design", "design lead", "designer",
 ]
+# Matched on word boundaries ("ui" no longer matches "build"); weight 1.0 unless listed
+DESIGN_KEYWORD_WEIGHTS = {
+    "designer": 2.0, "product design": 2.0, "graphic design": 2.0, "visual design": 2.0,
+    "design lead": 2.0, "art director": 2.0, "brand": 0.5, "creative": 0.5,
+}
+# Found anywhere in the text, these subtract their weight from the score
+NEGATIVE_KEYWORDS = {
+    "interior design": 2.0, "circuit design": 2.0, "chip design": 2.0,
+    "pcb design": 2.0, "instructional design": 2.0, "system design": 1.0,
+}
+DESIGN_MIN_SCORE = float(os.environ.get("DESIGN_MIN_SCORE", "1.0"))
 
 def ensure_data_dir():
     DATA_DIR.mkdir(exist_ok=True)
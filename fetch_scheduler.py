@@ -0,0 +1,194 @@
+"""
+Polite fetching: per-host token buckets, retries with exponential backoff and
+jitter (honouring Retry-After), and a circuit breaker that skips hosts which
+keep failing. Breaker state survives between runs in DATA_DIR.
+"""
+import email.utils
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from config import (
+    HOST_HEALTH_JSON,
+    FETCH_HOST_RATE,
+    FETCH_HOST_BURST,
+    FETCH_MAX_RETRIES,
+    BREAKER_FAILURES,
+    BREAKER_COOLDOWN_HOURS,
+    ensure_data_dir,
+)
+from http_client import get_session
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 60.0  # longer waits are not worth holding a worker for
+
+
+class HostUnavailable(Exception):
+    """The host's circuit breaker is open; the request was not sent."""
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def retry_after_seconds(response) -> float | None:
+    """Retry-After as seconds (delta or HTTP date), None if absent or invalid."""
+    value = (response.headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens for a host after `threshold` consecutive failed fetches and stays
+    open for `cooldown` seconds; the next fetch after that is a trial.
+    """
+
+    def __init__(self, path=HOST_HEALTH_JSON, threshold: int = BREAKER_FAILURES,
+                 cooldown: float = BREAKER_COOLDOWN_HOURS * 3600):
+        self.path = path
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.hosts = self._load()
+        self.dirty = False
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return dict(json.loads(self.path.read_text(encoding="utf-8")).get("hosts", {}))
+        except Exception:
+            return {}
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            ensure_data_dir()
+            self.path.write_text(
+                json.dumps({"hosts": self.hosts}, indent=2, sort_keys=True),
+                encoding="utf-8",
+            )
+            self.dirty = False
+
+    def allow(self, host: str) -> bool:
+        if self.threshold <= 0:
+            return True
+        with self.lock:
+            state = self.hosts.get(host)
+            return not state or state.get("open_until", 0) <= time.time()
+
+    def record_success(self, host: str) -> None:
+        with self.lock:
+            if host in self.hosts:
+                del self.hosts[host]
+                self.dirty = True
+
+    def record_failure(self, host: str, open_for: float | None = None) -> None:
+        """Count a failed fetch; open_for forces the breaker open (e.g. a long Retry-After)."""
+        with self.lock:
+            state = self.hosts.setdefault(host, {"failures": 0, "open_until": 0})
+            state["failures"] += 1
+            if open_for:
+                state["open_until"] = time.time() + open_for
+            elif self.threshold > 0 and state["failures"] >= self.threshold:
+                state["open_until"] = time.time() + self.cooldown
+            self.dirty = True
+
+
+class FetchScheduler:
+    """Thread-safe: fetches run in worker threads."""
+
+    def __init__(self, rate: float = FETCH_HOST_RATE, burst: float = FETCH_HOST_BURST,
+                 max_retries: int = FETCH_MAX_RETRIES, breaker: CircuitBreaker | None = None):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.buckets: dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _backoff(self, attempt: int) -> float:
+        return min(30.0, 2.0 ** attempt) * (0.5 + random.random())
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET through the pooled scraper session, with politeness. Returns the
+        final response (the caller checks the status); raises HostUnavailable
+        when the breaker is open.
+        """
+        host = _host(url)
+        if not self.breaker.allow(host):
+            raise HostUnavailable(f"{host} is cooling down after repeated failures")
+        bucket = self._bucket(host)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                r = get_session("scraper").get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    self.breaker.record_failure(host)
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            if r.status_code in RETRY_STATUSES:
+                wait = retry_after_seconds(r)
+                if wait is not None and wait > MAX_RETRY_AFTER:
+                    self.breaker.record_failure(host, open_for=wait)
+                    return r
+                if attempt < self.max_retries:
+                    time.sleep(wait if wait is not None else self._backoff(attempt))
+                    continue
+            if r.status_code == 429 or r.status_code >= 500:
+                self.breaker.record_failure(host)
+            elif r.status_code < 400:
+                self.breaker.record_success(host)
+            # Other 4xx (a closed posting, a guessed page past the end) say nothing about the host
+            return r
+
+
+fetch_scheduler = FetchScheduler()
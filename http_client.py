@@ -0,0 +1,97 @@
+"""
+Shared HTTP transport: pooled keep-alive sessions for the scraper and the
+LLM client, one pooled Telegram Bot per token (HTTP/2 when h2 is installed),
+and the thread pools async code runs those blocking calls in.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_SIZE,
+    TELEGRAM_API_URL,
+)
+
+# (connect, read) seconds
+SCRAPER_TIMEOUT = (5, 15)
+LLM_TIMEOUT = (5, 60)
+
+_sessions: dict[str, requests.Session] = {}
+_bots: dict = {}
+_lock = threading.Lock()
+
+
+def get_session(name: str = "default") -> requests.Session:
+    """
+    Session shared by everyone using the same name. Connections are kept
+    alive and pooled: HTTP_POOL_HOSTS hosts, HTTP_POOL_SIZE connections each.
+    Retries are left to the callers, which already implement backoff.
+    """
+    with _lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_HOSTS,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=0,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[name] = session
+        return session
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def telegram_request(pool_size: int = HTTP_POOL_SIZE):
+    """python-telegram-bot transport with a sized pool and consistent timeouts."""
+    from telegram.request import HTTPXRequest
+
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=5.0,
+        read_timeout=15.0,
+        write_timeout=15.0,
+        pool_timeout=5.0,
+        http_version="2" if http2_available() else "1.1",
+    )
+
+
+def get_bot(token: str):
+    """
+    One Bot per token for the whole process. Its connection pool belongs to
+    the event loop that first uses it, so share it only within one loop.
+    """
+    from telegram import Bot
+
+    with _lock:
+        bot = _bots.get(token)
+        if bot is None:
+            bot = _bots[token] = Bot(token=token, request=telegram_request(), base_url=TELEGRAM_API_URL)
+        return bot
+
+
+@contextmanager
+def blocking_pool(max_workers: int):
+    """
+    ThreadPoolExecutor for use inside a coroutine. Leaving the block does not
+    wait for calls still running: when the coroutine is cancelled (/cancel),
+    waiting here would block the event loop until every fetch or letter in
+    flight finished. Queued calls are dropped; running ones finish unobserved.
+    """
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,126 @@
+"""
+Cross-board duplicate detection: URL canonicalisation plus a content
+fingerprint (normalised title + company + MinHash of the description).
+"""
+import hashlib
+import random
+import re
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "ref", "refs",
+    "referrer", "source", "src", "trk", "trackingid", "gh_src", "lever-source",
+    "lever-origin", "utm",
+}
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+MIN_SHINGLES = 8  # shorter descriptions are too generic to compare
+SIMILARITY_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def canonical_url(url: str) -> str:
+    """Same posting, same string: lower-case host without www, no tracking params, fragment or trailing slash."""
+    if not url:
+        return ""
+    p = urlparse(url.strip())
+    host = (p.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if p.port and not (p.scheme == "http" and p.port == 80) and not (p.scheme == "https" and p.port == 443):
+        host = f"{host}:{p.port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+    path = p.path.rstrip("/") or "/"
+    return urlunparse(((p.scheme or "https").lower(), host, path, "", urlencode(query), ""))
+
+
+def _normalize_title(title: str) -> str:
+    title = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", (title or "").lower())
+    return " ".join(re.findall(r"\w+", title))
+
+
+def _normalize_company(company: str) -> str:
+    words = re.findall(r"\w+", (company or "").lower())
+    while words and words[-1] in ("inc", "ltd", "llc", "gmbh", "plc", "co", "corp", "limited"):
+        words.pop()
+    return " ".join(words)
+
+
+def _shingles(text: str) -> set[str]:
+    words = re.findall(r"\w+", (text or "").lower())
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> tuple[int, ...]:
+    """MinHash signature of the description's word shingles; () when it is too short."""
+    shingles = _shingles(text)
+    if len(shingles) < MIN_SHINGLES:
+        return ()
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles
+    ]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    if a == b:
+        return 1.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    title_key: str
+    company: str
+    signature: tuple[int, ...]
+
+    def is_duplicate_of(self, other: "Fingerprint", by_company: bool = True) -> bool:
+        """
+        Same normalised title, and either near-identical descriptions or,
+        when one of them has no usable description and by_company is on,
+        the same company. Title and company alone are weak evidence (one
+        company often has several openings with the same title), so callers
+        only allow it for mirrors found in the same run.
+        """
+        if not self.title_key or self.title_key != other.title_key:
+            return False
+        if self.signature and other.signature:
+            return similarity(self.signature, other.signature) >= SIMILARITY_THRESHOLD
+        return by_company and bool(self.company) and self.company == other.company
+
+
+def title_key(job: dict) -> str:
+    """The normalised title; only jobs with equal keys can be duplicates. Cheap, unlike fingerprint()."""
+    return _normalize_title(job.get("title", ""))
+
+
+def fingerprint(job: dict, signatures: dict[str, tuple[int, ...]] | None = None) -> Fingerprint:
+    """signatures, when given, caches MinHash by description: mirrors usually copy it verbatim."""
+    title = job.get("title", "")
+    description = job.get("description", "")
+    if description == title:
+        signature = ()
+    elif signatures is None:
+        signature = minhash(description)
+    else:
+        signature = signatures.get(description)
+        if signature is None:
+            signature = signatures[description] = minhash(description)
+    return Fingerprint(
+        title_key=title_key(job),
+        company=_normalize_company(job.get("company", "")),
+        signature=signature,
+    )
@@ -0,0 +1,198 @@
+"""
+Job detail pages: full description, location, seniority and salary of one
+posting, from schema.org JobPosting JSON-LD when the page has it, else from
+the densest text block of the page (readability-style). Results are cached
+by canonical URL so a posting is fetched at most once per DETAILS_CACHE_DAYS.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from config import (
+    JOB_DETAILS_DB,
+    DETAILS_CACHE_DAYS,
+    ensure_data_dir,
+)
+from site_adapters import MAX_DESCRIPTION, html_to_text, job_posting_nodes
+
+DETAIL_FIELDS = ("description", "location", "seniority", "salary")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    url TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_SENIORITY_RE = re.compile(
+    r"\b(intern|internship|junior|middle|mid[- ]level|senior|staff|principal|lead|head of|director)\b",
+    re.I,
+)
+_SALARY_RE = re.compile(
+    r"(?:[$€£₽]\s?\d[\d\s,.]*\s?[kKкК]?(?:\s?[-–—]\s?[$€£₽]?\s?\d[\d\s,.]*\s?[kKкК]?)?"
+    r"|\d[\d\s,.]*\s?[kKкК]?(?:\s?[-–—]\s?\d[\d\s,.]*\s?[kKкК]?)?\s?(?:USD|EUR|GBP|RUB|руб\.?|₽))"
+    r"(?:\s?(?:per|a|/)\s?(?:year|yr|annum|month|mo|hour|hr))?",
+)
+_LOCATION_RE = re.compile(r"\bLocations?\s*[:\-–]\s*([^\n|•]{2,80})", re.I)
+_NOISE_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg")
+
+
+def _seniority(*texts: str) -> str:
+    for text in texts:
+        m = _SENIORITY_RE.search(text or "")
+        if m:
+            return m.group(1).lower()
+    return ""
+
+
+def _ld_location(node: dict) -> str:
+    if str(node.get("jobLocationType", "")).upper() == "TELECOMMUTE":
+        return "Remote"
+    places = node.get("jobLocation") or []
+    places = places if isinstance(places, list) else [places]
+    out = []
+    for place in places:
+        address = place.get("address") if isinstance(place, dict) else None
+        if isinstance(address, dict):
+            parts = [address.get(k) for k in ("addressLocality", "addressRegion", "addressCountry")]
+            parts = [p.get("name", "") if isinstance(p, dict) else str(p) for p in parts if p]
+            if parts:
+                out.append(", ".join(parts))
+        elif isinstance(address, str):
+            out.append(address)
+    return "; ".join(dict.fromkeys(out))
+
+
+def _ld_salary(node: dict) -> str:
+    salary = node.get("baseSalary") or node.get("estimatedSalary")
+    if isinstance(salary, list):
+        salary = salary[0] if salary else None
+    if not isinstance(salary, dict):
+        return str(salary or "")
+    value = salary.get("value")
+    currency = salary.get("currency", "")
+    unit = ""
+    if isinstance(value, dict):
+        unit = value.get("unitText", "")
+        low, high = value.get("minValue"), value.get("maxValue")
+        amount = f"{low}–{high}" if low and high else str(value.get("value") or low or high or "")
+    else:
+        amount = str(value or "")
+    if not amount:
+        return ""
+    return " ".join(p for p in (amount, currency, f"per {unit.lower()}" if unit else "") if p)
+
+
+def _from_json_ld(html: str) -> dict | None:
+    for node in job_posting_nodes(html):
+        description = html_to_text(node.get("description", ""))
+        if not description:
+            continue
+        return {
+            "description": description,
+            "location": _ld_location(node),
+            "seniority": _seniority(
+                node.get("title", ""),
+                str(node.get("experienceRequirements", "")),
+                str(node.get("occupationalCategory", "")),
+            ),
+            "salary": _ld_salary(node),
+        }
+    return None
+
+
+def _main_text(html: str, parser: str) -> str:
+    """Readability-style: the container holding the most paragraph text wins. One line per block."""
+    soup = BeautifulSoup(html, parser)
+    for tag in soup(_NOISE_TAGS):
+        tag.decompose()
+    scores = {}
+    nodes = {}
+    for p in soup.find_all(["p", "li", "h2", "h3"]):
+        text = p.get_text(" ", strip=True)
+        if len(text) < 25:
+            continue
+        weight = len(text) - sum(len(a.get_text(strip=True)) for a in p.find_all("a"))
+        for depth, parent in enumerate(p.parents):
+            if depth > 2 or parent.name in ("html", "[document]"):
+                break
+            key = id(parent)
+            nodes[key] = parent
+            scores[key] = scores.get(key, 0) + weight / (depth + 1)
+    if scores:
+        best = nodes[max(scores, key=scores.get)]
+    else:
+        best = soup.body or soup
+    lines = (" ".join(line.split()) for line in best.get_text("\n", strip=True).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def extract_details(html: str, title: str = "", parser: str = "html.parser") -> dict:
+    """{"description", "location", "seniority", "salary"} of a job page; missing fields are ""."""
+    details = _from_json_ld(html)
+    if details is None:
+        text = _main_text(html, parser)
+        location = _LOCATION_RE.search(text)
+        salary = _SALARY_RE.search(text)
+        details = {
+            "description": " ".join(text.split())[:MAX_DESCRIPTION],
+            "location": location.group(1).strip() if location else "",
+            "seniority": _seniority(title, text[:300]),
+            "salary": salary.group(0).strip() if salary else "",
+        }
+    if not details["seniority"]:
+        details["seniority"] = _seniority(title)
+    return details
+
+
+class DetailCache:
+    """Thread-safe: details are fetched from worker threads."""
+
+    def __init__(self, path: Path = JOB_DETAILS_DB, max_age_days: float = DETAILS_CACHE_DAYS):
+        self.path = Path(path)
+        self.max_age = max_age_days * 86400
+        self.lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        ensure_data_dir()
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        try:
+            if not self._ready:
+                conn.executescript(_SCHEMA)
+                conn.execute("DELETE FROM details WHERE fetched < ?", (time.time() - self.max_age,))
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url: str) -> dict | None:
+        if self.max_age <= 0:
+            return None
+        with self.lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM details WHERE url = ? AND fetched >= ?",
+                (url, time.time() - self.max_age),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, url: str, details: dict) -> None:
+        if self.max_age <= 0:
+            return
+        with self.lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO details (url, data, fetched) VALUES (?, ?, ?)",
+                (url, json.dumps(details, ensure_ascii=False), time.time()),
+            )
+
+
+detail_cache = DetailCache()
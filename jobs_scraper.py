@@ -3,52 +3,137 @@ Scrape job boards and filter design-related vacancies.
 """
 import re
 import json
-import requests
+import time
+import asyncio
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 
+from board_diff import BoardDiff, card_key, diff_jobs
 from config import (
-    DATA_DIR,
-    SEEN_JOBS_JSON,
+    PAGE_CACHE_JSON,
     DESIGN_KEYWORDS,
+    DESIGN_KEYWORD_WEIGHTS,
+    NEGATIVE_KEYWORDS,
+    DESIGN_MIN_SCORE,
+    FETCH_CONCURRENCY,
+    FETCH_PER_HOST_CONCURRENCY,
+    CRAWL_MAX_PAGES,
+    CRAWL_MAX_FRONTIER,
+    CRAWL_CONCURRENCY,
+    CRAWL_FULL_HOURS,
+    ENRICH_CONCURRENCY,
+    ENRICH_MIN_DESCRIPTION,
+    HTML_PARSER,
     ensure_data_dir,
 )
+from fetch_scheduler import fetch_scheduler
+from http_client import SCRAPER_TIMEOUT, blocking_pool
+from job_dedupe import Fingerprint, canonical_url, fingerprint, title_key
+from job_details import DETAIL_FIELDS, detail_cache, extract_details
+from keyword_matcher import KeywordMatcher
+from metrics import metrics
+from pagination import next_page_urls, normalize_page_url, unwrap_json_page
+from parse_pool import parse_page
+from seen_store import open_seen_store
+from site_adapters import (
+    SiteAdapter,
+    find_adapter,
+    host_matches,
+    parse_json_ld,
+    register_adapter,
+)
+
+# Company pages link to these from headers and footers; they are never job cards
+_social_link = host_matches(
+    "facebook.com", "instagram.com", "twitter.com", "x.com", "linkedin.com", "youtube.com",
+    "tiktok.com", "t.me", "vk.com", "github.com", "medium.com", "dribbble.com", "behance.net",
+)
+
+
+def _resolve_parser(name: str) -> str:
+    if name != "auto":
+        return name
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+SOUP_PARSER = _resolve_parser(HTML_PARSER)
+DESIGN_MATCHER = KeywordMatcher(
+    DESIGN_KEYWORDS,
+    DESIGN_KEYWORD_WEIGHTS,
+    NEGATIVE_KEYWORDS,
+    DESIGN_MIN_SCORE,
+)
+
+
+def _make_soup(html: str, parser: str | None = None) -> BeautifulSoup:
+    return BeautifulSoup(html, parser or SOUP_PARSER)
+
+
+def _container_text(node, cache: dict) -> str:
+    """get_text of a container, computed once per container per page."""
+    key = id(node)
+    text = cache.get(key)
+    if text is None:
+        text = node.get_text(separator=" ", strip=True)
+        cache[key] = text
+    return text
+
 
+PAGE_CACHE_TTL = 30 * 24 * 3600  # boards nobody fetched for this long are dropped
 
-def _load_seen():
+
+def load_page_cache() -> dict:
+    """url -> {"etag", "last_modified", "hash", "jobs", "checked"} from the previous runs."""
     ensure_data_dir()
-    if not SEEN_JOBS_JSON.exists():
-        return set()
+    if not PAGE_CACHE_JSON.exists():
+        return {}
     try:
-        data = json.loads(SEEN_JOBS_JSON.read_text(encoding="utf-8"))
-        return set(data.get("seen", []))
+        data = json.loads(PAGE_CACHE_JSON.read_text(encoding="utf-8"))
+        return dict(data.get("pages", {}))
     except Exception:
-        return set()
+        return {}
 
 
-def _save_seen(seen):
+def save_page_cache(cache: dict) -> None:
     ensure_data_dir()
-    SEEN_JOBS_JSON.write_text(
-        json.dumps({"seen": list(seen)}, ensure_ascii=False, indent=2),
+    # Merge with entries written meanwhile by other runs (other chats' /check)
+    pages = {**load_page_cache(), **cache}
+    cutoff = time.time() - PAGE_CACHE_TTL
+    pages = {u: e for u, e in pages.items() if e.get("checked", 0) >= cutoff}
+    PAGE_CACHE_JSON.write_text(
+        json.dumps({"pages": pages}, ensure_ascii=False),
         encoding="utf-8",
     )
 
 
-def _matches_design(job: dict) -> bool:
-    """True if job is design-related by title, team, or description."""
+def design_score(job: dict, matcher: KeywordMatcher = DESIGN_MATCHER) -> float:
+    """Weighted keyword score of title, team, company and description."""
     text = " ".join(
-        str(job.get(k, "")).lower()
+        str(job.get(k, ""))
         for k in ("title", "team", "company", "description")
     )
-    return any(kw in text for kw in DESIGN_KEYWORDS)
+    return matcher.score(text)
 
 
-def scrape_wise_jobs(html: str, base_url: str) -> list[dict]:
+def _matches_design(job: dict, matcher: KeywordMatcher = DESIGN_MATCHER) -> bool:
+    """True if job is design-related by title, team, or description."""
+    return design_score(job, matcher) >= matcher.min_score
+
+
+def scrape_wise_jobs(html: str, base_url: str, parser: str | None = None) -> list[dict]:
     """
     Parse wise.jobs jobs page. Expects HTML with job cards containing
     links to /job/..., title, Team: X, Description.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _make_soup(html, parser)
+    texts = {}
     jobs = []
     # Links like /job/something-jid-123
     for a in soup.find_all("a", href=re.compile(r"/job/[-a-z0-9]+-jid-\d+")):
@@ -64,7 +149,7 @@ def scrape_wise_jobs(html: str, base_url: str) -> list[dict]:
         team = ""
         desc = ""
         if card:
-            card_text = card.get_text(separator=" ", strip=True)
+            card_text = _container_text(card, texts)
             team_m = re.search(r"Team\s*[:\s]+(\w+)", card_text, re.I)
             if team_m:
                 team = team_m.group(1)
@@ -88,11 +173,20 @@ def scrape_wise_jobs(html: str, base_url: str) -> list[dict]:
     return out
 
 
-def scrape_generic(html: str, base_url: str) -> list[dict]:
+def scrape_generic(html: str, base_url: str, parser: str | None = None) -> list[dict]:
     """
-    Generic parser: find any links that look like job pages and have design-related text nearby.
+    Generic parser: every link that could be a job, with the text of its
+    container as the description. Links that are clearly not jobs (mailto and
+    other schemes, anchors on the listing itself, navigation and footer links,
+    social profiles) are dropped, so they neither fill the page cache nor show
+    up as board changes. Links are not filtered by keywords here:
+    the page is parsed once for all subscribers, and each applies its own
+    keywords in select_new_jobs. Text of each container is extracted once and
+    shared by all links inside it.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _make_soup(html, parser)
+    base = urlparse(base_url)
+    texts = {}
     jobs = []
     for a in soup.find_all("a", href=True):
         href = a.get("href", "")
@@ -100,22 +194,29 @@ def scrape_generic(html: str, base_url: str) -> list[dict]:
             continue
         full_url = urljoin(base_url, href)
         parsed = urlparse(full_url)
+        if parsed.scheme not in ("http", "https"):
+            continue
+        # The listing itself, e.g. "/careers#design" or "?lang=en"
+        if parsed.netloc == base.netloc and parsed.path.rstrip("/") == base.path.rstrip("/"):
+            continue
+        if parsed.netloc != base.netloc and _social_link(full_url):
+            continue
         # Skip external, assets, auth
         if parsed.path in ("/", "") or any(x in parsed.path for x in ("/login", "/sign-in", "/blog", "/posts")):
             continue
+        if a.find_parent(["nav", "footer"]):
+            continue
         title = (a.get_text(strip=True) or "").strip()
         if len(title) < 5 or len(title) > 300:
             continue
         parent = a.find_parent(["article", "div", "li", "section"])
-        context = (parent.get_text(separator=" ", strip=True) if parent else title).lower()
-        if not any(kw in context for kw in DESIGN_KEYWORDS):
-            continue
+        parent_text = _container_text(parent, texts) if parent else title
         jobs.append({
             "url": full_url,
             "title": title,
             "team": "",
             "company": parsed.netloc.replace("www.", "").split(".")[0] or "Company",
-            "description": (parent.get_text(separator=" ", strip=True)[:500] if parent else title),
+            "description": parent_text[:500] if parent else title,
         })
     seen_urls = set()
     out = []
@@ -126,50 +227,491 @@ def scrape_generic(html: str, base_url: str) -> list[dict]:
     return out
 
 
-def fetch_page(url: str, timeout: int = 15) -> str:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
-    r = requests.get(url, headers=headers, timeout=timeout)
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def fetch_page(url: str, timeout=SCRAPER_TIMEOUT, accept: str = "") -> str:
+    headers = {**FETCH_HEADERS, "Accept": accept} if accept else FETCH_HEADERS
+    with metrics.span("fetch_page"):
+        r = fetch_scheduler.get(url, headers=headers, timeout=timeout)
+    metrics.add_bytes(len(r.content))
     r.raise_for_status()
     return r.text
 
 
-def get_jobs_for_url(url: str) -> list[dict]:
-    """Fetch URL, choose parser by domain, return list of job dicts."""
-    html = fetch_page(url)
-    parsed = urlparse(url)
-    if "wise.jobs" in parsed.netloc:
-        jobs = scrape_wise_jobs(html, url)
+def fetch_page_conditional(
+    url: str,
+    cached: dict | None = None,
+    timeout=SCRAPER_TIMEOUT,
+    accept: str = "",
+) -> tuple[str | None, dict]:
+    """
+    Conditional GET using the validators stored in `cached`.
+    Returns (html, entry): html is None when the page has not changed since
+    the cached copy (304 Not Modified or identical content hash).
+    """
+    cached = cached or {}
+    headers = {**FETCH_HEADERS, "Accept": accept} if accept else dict(FETCH_HEADERS)
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    with metrics.span("fetch_page"):
+        r = fetch_scheduler.get(url, headers=headers, timeout=timeout)
+    metrics.add_bytes(len(r.content))
+    if r.status_code == 304 and cached.get("hash"):
+        return None, cached
+    r.raise_for_status()
+    html = r.text
+    entry = {
+        "etag": r.headers.get("ETag", ""),
+        "last_modified": r.headers.get("Last-Modified", ""),
+        "hash": hashlib.sha256(html.encode("utf-8")).hexdigest(),
+    }
+    if entry["hash"] == cached.get("hash"):
+        return None, {**cached, **entry}
+    return html, entry
+
+
+def _parse_generic_page(html: str, url: str) -> list[dict]:
+    """schema.org JobPosting data when the page has it, else the link heuristics."""
+    return parse_json_ld(html, url) or scrape_generic(html, url)
+
+
+WISE_ADAPTER = register_adapter(SiteAdapter(
+    name="wise",
+    matches=host_matches("wise.jobs"),
+    parse=scrape_wise_jobs,
+    follow_pages=True,
+))
+GENERIC_ADAPTER = SiteAdapter(
+    name="generic",
+    matches=lambda url: True,
+    parse=_parse_generic_page,
+    follow_pages=True,
+)
+
+
+def adapter_for_url(url: str) -> SiteAdapter:
+    """Registered adapter for the URL's site, or the generic HTML parser."""
+    return find_adapter(url) or GENERIC_ADAPTER
+
+
+def _fetch_listing_page(adapter: SiteAdapter, page_url: str) -> tuple[str, str, list[dict]]:
+    """(page_url, body, jobs) of one further page; a failed page yields no jobs."""
+    try:
+        body = fetch_page(page_url, accept=adapter.accept)
+    except Exception as e:
+        print(f"Error fetching page {page_url}: {e}")
+        metrics.count("page_errors")
+        return page_url, "", []
+    fragment, _ = unwrap_json_page(body)
+    return page_url, body, _parse(adapter, fragment or body, page_url)
+
+
+def crawl_listing(
+    adapter: SiteAdapter,
+    first_url: str,
+    first_body: str,
+    first_jobs: list[dict],
+    known: set[str],
+    full: bool = False,
+    max_pages: int = CRAWL_MAX_PAGES,
+) -> tuple[dict[str, list[dict]], bool]:
+    """
+    Follow the pagination of a listing whose first page is already parsed.
+    Pages are fetched CRAWL_CONCURRENCY at a time, in page order. Links of a
+    page whose jobs are all in `known` are not followed unless `full`, so a
+    board that did not change much costs about one page. Returns (page url ->
+    jobs, including the first page, complete); complete is False when the
+    crawl stopped early or hit max_pages, i.e. deeper pages were not seen.
+    """
+    first_url = normalize_page_url(first_url)
+    pages = {first_url: first_jobs}
+    frontier = []
+    stopped = False
+    board = metrics.current_board()
+
+    def fetch(page_url: str):
+        # Pool threads count their bytes for the board being crawled
+        with metrics.board_scope(board):
+            return _fetch_listing_page(adapter, page_url)
+
+    def follow(body: str, page_url: str, jobs: list[dict]) -> None:
+        nonlocal stopped
+        if jobs and not full and all(card_key(j) in known for j in jobs):
+            stopped = True
+            return
+        for link in next_page_urls(body, page_url, had_jobs=bool(jobs)):
+            if link not in pages and link not in frontier and len(frontier) < CRAWL_MAX_FRONTIER:
+                frontier.append(link)
+
+    follow(first_body, first_url, first_jobs)
+    with ThreadPoolExecutor(max_workers=max(1, CRAWL_CONCURRENCY)) as pool:
+        while frontier and len(pages) < max_pages:
+            batch = frontier[:min(max(1, CRAWL_CONCURRENCY), max_pages - len(pages))]
+            del frontier[:len(batch)]
+            for page_url, body, jobs in pool.map(fetch, batch):
+                pages[page_url] = jobs
+                follow(body, page_url, jobs)
+    return pages, not frontier and not stopped
+
+
+def fetch_board_jobs(url: str, page_cache: dict | None = None, diffs: dict | None = None) -> list[dict]:
+    """
+    Fetch URL, choose parser by site adapter, return all parsed job dicts.
+    With page_cache, the request is conditional and an unchanged page
+    reuses the jobs parsed last time instead of being parsed again.
+    With diffs too, diffs[url] is set to the BoardDiff against the cached jobs.
+    Time, bytes and jobs are counted for the board in metrics.
+    """
+    t0 = time.perf_counter()
+    try:
+        with metrics.board_scope(url):
+            jobs = _fetch_board_jobs(url, page_cache, diffs)
+    finally:
+        metrics.board(url, fetches=1, seconds=time.perf_counter() - t0)
+    metrics.board(url, jobs=len(jobs))
+    return jobs
+
+
+def _parse(adapter: SiteAdapter, html: str, url: str) -> list[dict]:
+    """adapter.parse, in the parse pool when the page is large."""
+    with metrics.span(f"parse.{adapter.name}"):
+        return parse_page(adapter.parse, html, url)
+
+
+def _fetch_board_jobs(url: str, page_cache: dict | None, diffs: dict | None) -> list[dict]:
+    adapter = adapter_for_url(url)
+    source = adapter.source_url(url)
+    if page_cache is None:
+        return _parse(adapter, fetch_page(source, accept=adapter.accept), url)
+    cached = page_cache.get(url)
+    if cached and cached.get("adapter") != adapter.name:
+        cached = None
+    previous = (cached or {}).get("jobs") or []
+    crawled = (cached or {}).get("crawled", 0)
+    crawls = adapter.follow_pages and CRAWL_MAX_PAGES > 1
+    full = crawls and time.time() - crawled >= CRAWL_FULL_HOURS * 3600
+    # A due full crawl goes past page 1 even if it did not change: deeper pages may have
+    html, entry = fetch_page_conditional(source, None if full else cached, accept=adapter.accept)
+    if html is None and cached and "jobs" in cached:
+        jobs = cached["jobs"]
+        diff = BoardDiff(unchanged=len(jobs))
+        metrics.board(url, not_modified=1)
     else:
-        jobs = scrape_generic(html, url)
-    return [j for j in jobs if _matches_design(j)]
+        if html is None:
+            html = fetch_page(source, accept=adapter.accept)
+        jobs = _parse(adapter, html, url)
+        if crawls:
+            pages, complete = crawl_listing(adapter, source, html, jobs, {card_key(j) for j in previous}, full)
+            page_keys = {u: [card_key(j) for j in js] for u, js in pages.items()}
+            carried = []
+            if not complete:
+                # Pages not crawled this time keep last run's jobs until the next full crawl
+                old_pages = {u: k for u, k in (cached or {}).get("pages", {}).items() if u not in pages}
+                stale = {k for keys in old_pages.values() for k in keys}
+                carried = [j for j in previous if card_key(j) in stale]
+                page_keys = {**old_pages, **page_keys}
+            jobs = _merge_pages([j for js in pages.values() for j in js], carried)
+            entry = {**entry, "pages": page_keys}
+            if full:
+                crawled = time.time()
+        diff = diff_jobs(previous, jobs)
+    if diffs is not None:
+        diffs[url] = diff
+    page_cache[url] = {
+        **entry,
+        "adapter": adapter.name,
+        "jobs": jobs,
+        "checked": time.time(),
+        "crawled": crawled,
+    }
+    return jobs
 
 
-def get_new_jobs(urls: list[str]) -> list[dict]:
+def _merge_pages(jobs: list[dict], carried: list[dict]) -> list[dict]:
+    """Jobs of the crawled pages, then the carried-over ones, without repeats."""
+    out = []
+    keys = set()
+    for j in [*jobs, *carried]:
+        key = card_key(j)
+        if key not in keys:
+            keys.add(key)
+            out.append(j)
+    return out
+
+
+def get_jobs_for_url(url: str, page_cache: dict | None = None) -> list[dict]:
+    """Fetch URL, choose parser by domain, return list of design job dicts."""
+    return [j for j in fetch_board_jobs(url, page_cache) if _matches_design(j)]
+
+
+async def iter_jobs_for_urls(
+    urls: list[str],
+    concurrency: int = FETCH_CONCURRENCY,
+    per_host: int = FETCH_PER_HOST_CONCURRENCY,
+    page_cache: dict | None = None,
+    diffs: dict | None = None,
+):
     """
-    For each URL in urls, fetch and parse jobs; filter design; exclude already seen.
-    Mark returned jobs as seen.
+    Fetch and parse all URLs concurrently. Yields (url, jobs, error) as each
+    board finishes, so parsing starts as soon as its page arrives. Jobs are
+    not filtered yet: each subscriber applies its own keywords.
+    At most `concurrency` boards are in flight, and at most `per_host` per host.
+    page_cache and diffs are passed through to fetch_board_jobs.
     """
-    seen = _load_seen()
-    new_jobs = []
-    for url in urls:
+    loop = asyncio.get_running_loop()
+    global_limit = asyncio.Semaphore(max(1, concurrency))
+    host_limits = defaultdict(lambda: asyncio.Semaphore(max(1, per_host)))
+
+    with blocking_pool(concurrency) as pool:
+
+        async def worker(url):
+            host = urlparse(url).netloc.lower()
+            # Host slot first: a task waiting on a busy host must not hold a global slot
+            async with host_limits[host], global_limit:
+                try:
+                    jobs = await loop.run_in_executor(pool, fetch_board_jobs, url, page_cache, diffs)
+                except Exception as e:
+                    metrics.board(url, errors=1)
+                    return url, [], e
+            return url, jobs, None
+
+        tasks = [asyncio.create_task(worker(u)) for u in urls]
         try:
-            jobs = get_jobs_for_url(url)
-            for j in jobs:
-                job_id = j.get("url") or j.get("title", "")
-                if job_id and job_id not in seen:
-                    seen.add(job_id)
-                    new_jobs.append(j)
-        except Exception as e:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+async def scrape_boards(
+    urls: list[str],
+    progress=None,
+    page_cache: dict | None = None,
+    diffs: dict | None = None,
+) -> dict[str, list[dict]]:
+    """
+    Fetch and parse each unique URL once. Returns url -> all jobs on the board
+    (empty for boards that failed). progress(done, total) is called after each board.
+    A page_cache passed in is kept in memory by the caller, which saves it;
+    otherwise the cache is loaded from and saved to PAGE_CACHE_JSON.
+    diffs, if given, receives url -> BoardDiff for every board fetched.
+    """
+    urls = list(dict.fromkeys(urls))
+    persist = page_cache is None
+    if persist:
+        page_cache = load_page_cache()
+    by_url = {}
+    async for url, jobs, error in iter_jobs_for_urls(urls, page_cache=page_cache, diffs=diffs):
+        if error is not None:
             # Log but don't fail whole run
-            print(f"Error scraping {url}: {e}")
-    _save_seen(seen)
+            print(f"Error scraping {url}: {error}")
+        by_url[url] = jobs
+        if progress:
+            progress(len(by_url), len(urls))
+    if persist:
+        await asyncio.to_thread(save_page_cache, {u: page_cache[u] for u in urls if u in page_cache})
+        await asyncio.to_thread(fetch_scheduler.breaker.save)
+    return by_url
+
+
+def select_new_jobs(
+    urls: list[str],
+    by_url: dict[str, list[dict]],
+    matcher: KeywordMatcher = DESIGN_MATCHER,
+    scope: str = "",
+) -> list[dict]:
+    """
+    One subscriber's view of scraped boards: keyword filter, seen history and
+    duplicate collapsing in its own seen scope. Returned jobs are marked seen.
+    """
+    new_jobs = []
+    on_boards = []
+    with open_seen_store(scope) as seen:
+        new_ids = set()
+        picked = []  # (job_id, entry) of the jobs returned
+        # title key -> [board, job, fingerprint or None] of jobs picked in this run.
+        # Only jobs with the same title are compared, and MinHash is only computed
+        # for a job once another one with its title turns up.
+        by_title: dict[str, list[list]] = defaultdict(list)
+        history_titles = seen.fingerprint_titles()
+        signatures: dict[str, tuple[int, ...]] = {}
+
+        def entry_fingerprint(entry: list) -> Fingerprint:
+            if entry[2] is None:
+                entry[2] = fingerprint(entry[1], signatures)
+            return entry[2]
+
+        for url in dict.fromkeys(urls):
+            matched = 0
+            before = len(new_jobs)
+            filter_time = 0.0
+            for j in by_url.get(url, []):
+                t0 = time.perf_counter()
+                match = _matches_design(j, matcher)
+                filter_time += time.perf_counter() - t0
+                if not match:
+                    continue
+                matched += 1
+                job_id = canonical_url(j.get("url", "")) or j.get("title", "")
+                if not job_id:
+                    continue
+                on_boards.append(job_id)
+                if job_id in new_ids or job_id in seen:
+                    continue
+                new_ids.add(job_id)
+                # The same role from another board or mirror: one letter is enough.
+                # Cards on one board are separate openings even with the same title.
+                key = title_key(j)
+                entry = [url, j, None]
+                same_title = by_title[key] if key else ()
+                if same_title or key in history_titles:
+                    fp = entry_fingerprint(entry)
+                    if key in history_titles and seen.find_duplicate(fp):
+                        continue
+                    if any(
+                        fp.is_duplicate_of(entry_fingerprint(other), by_company=other[0] != url)
+                        for other in same_title
+                    ):
+                        continue
+                if key:
+                    by_title[key].append(entry)
+                picked.append((job_id, entry))
+                new_jobs.append(j)
+            # One filter span per board and subscriber; counts add up over subscribers
+            metrics.observe("filter", filter_time)
+            metrics.board(url, matches=matched, new=len(new_jobs) - before)
+        seen.add_many(on_boards)
+        # Sent jobs are compared with later runs' jobs, so theirs are all computed now
+        seen.add_fingerprints((job_id, entry_fingerprint(entry)) for job_id, entry in picked)
+        seen.evict_expired()
     return new_jobs
 
 
+def fetch_job_details(job: dict) -> dict:
+    """Details of one job from the cache or its detail page; {} if the page fails."""
+    url = canonical_url(job.get("url", ""))
+    if not url:
+        return {}
+    details = detail_cache.get(url)
+    if details is None:
+        with metrics.span("details"):
+            details = extract_details(fetch_page(job["url"]), job.get("title", ""), SOUP_PARSER)
+        detail_cache.put(url, details)
+    return details
+
+
+def _needs_details(job: dict, board_urls: set[str]) -> bool:
+    url = job.get("url", "")
+    return bool(url) and url not in board_urls and len(job.get("description") or "") < ENRICH_MIN_DESCRIPTION
+
+
+async def enrich_jobs(
+    jobs: list[dict],
+    board_urls=(),
+    concurrency: int = ENRICH_CONCURRENCY,
+    per_host: int = FETCH_PER_HOST_CONCURRENCY,
+) -> list[dict]:
+    """
+    Copies of jobs with the full description, location, seniority and salary
+    from their detail pages. Only called for jobs that passed the filters and
+    are new, so detail fetches scale with new relevant jobs. Each URL is
+    fetched once; jobs whose listing already had a long description, or that
+    point at the board itself, are left as they are.
+    """
+    board_urls = set(board_urls)
+    wanted = list(dict.fromkeys(
+        canonical_url(j["url"]) for j in jobs if concurrency > 0 and _needs_details(j, board_urls)
+    ))
+    details = {}
+    if wanted:
+        loop = asyncio.get_running_loop()
+        first = {}
+        for j in jobs:
+            first.setdefault(canonical_url(j.get("url", "")), j)
+        global_limit = asyncio.Semaphore(max(1, concurrency))
+        host_limits = defaultdict(lambda: asyncio.Semaphore(max(1, per_host)))
+
+        with blocking_pool(concurrency) as pool:
+
+            async def worker(url):
+                async with host_limits[urlparse(url).netloc.lower()], global_limit:
+                    try:
+                        details[url] = await loop.run_in_executor(pool, fetch_job_details, first[url])
+                    except Exception as e:
+                        print(f"Error fetching details {url}: {e}")
+                        metrics.count("details_errors")
+
+            await asyncio.gather(*(worker(u) for u in wanted))
+
+    out = []
+    for j in jobs:
+        extra = details.get(canonical_url(j.get("url", ""))) or {}
+        if extra:
+            j = dict(j)
+            if len(extra.get("description", "")) > len(j.get("description") or ""):
+                j["description"] = extra["description"]
+            for field in DETAIL_FIELDS[1:]:
+                if extra.get(field):
+                    j[field] = extra[field]
+        out.append(j)
+    return out
+
+
+async def get_new_jobs_async(urls: list[str], progress=None) -> list[dict]:
+    """
+    Async version of get_new_jobs: boards are fetched concurrently, the result
+    keeps the order of `urls` just like the sequential loop did.
+    progress(done, total) is called after each board.
+    """
+    by_url = await scrape_boards(urls, progress)
+    jobs = await asyncio.to_thread(select_new_jobs, urls, by_url)
+    return await enrich_jobs(jobs, urls)
+
+
+async def get_new_jobs_for_subscriptions(subscriptions, progress=None, enrich: bool = True) -> dict[int, list[dict]]:
+    """
+    Fan-out for many chats: every unique board is fetched and parsed once per
+    cycle, then each subscription filters the shared result with its own
+    keywords and seen history. Returns chat_id -> new jobs. Without enrich,
+    they are returned as soon as they are marked seen, so the caller can store
+    them before any detail page is fetched.
+    """
+    subscriptions = list(subscriptions)
+    all_urls = [u for sub in subscriptions for u in sub.urls]
+    by_url = await scrape_boards(all_urls, progress)
+    # Filtering, MinHash and the seen store are CPU and disk work: keep them off the loop
+    by_chat = {}
+    for sub in subscriptions:
+        by_chat[sub.chat_id] = await asyncio.to_thread(select_new_jobs, sub.urls, by_url, sub.matcher(), sub.scope)
+    if not enrich:
+        return by_chat
+    return await enrich_by_chat(by_chat, all_urls)
+
+
+async def enrich_by_chat(by_chat: dict[int, list[dict]], board_urls=()) -> dict[int, list[dict]]:
+    """enrich_jobs over every chat's new jobs at once, so a job new to several chats is fetched once."""
+    flat = [j for jobs in by_chat.values() for j in jobs]
+    enriched = iter(await enrich_jobs(flat, board_urls))
+    return {chat_id: [next(enriched) for _ in jobs] for chat_id, jobs in by_chat.items()}
+
+
+def get_new_jobs(urls: list[str]) -> list[dict]:
+    """
+    For each URL in urls, fetch and parse jobs; filter design; exclude already seen.
+    Mark returned jobs as seen. Boards are fetched concurrently.
+    Must not be called from a running event loop: use get_new_jobs_async there.
+    """
+    return asyncio.run(get_new_jobs_async(urls))
+
+
 if __name__ == "__main__":
     import sys
     from config import URLS_JSON
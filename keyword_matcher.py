@@ -0,0 +1,76 @@
+"""
+Keyword relevance matcher: all keywords compiled into one regex, matched on
+word boundaries in a single scan, with per-keyword weights and negative keywords.
+The regex is a trie of the keywords and runs on lower-cased text, and texts
+without any keyword's first word are skipped before it runs.
+"""
+import re
+
+
+def _trie_pattern(words) -> str:
+    """Regex matching exactly `words`, factored by common prefixes; longer matches are tried first."""
+    root = {}
+    for word in words:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        alternatives = [
+            (r"\s+" if ch == " " else re.escape(ch)) + emit(child)
+            for ch, child in sorted(node.items())
+            if ch
+        ]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(root)
+
+
+class KeywordMatcher:
+    """
+    score(text) sums the weight of every distinct keyword found in text
+    (negative keywords subtract theirs); matches(text) is score >= min_score.
+    Multi-word keywords match across any whitespace, and a trailing "s" is
+    allowed, so "designer" also matches "Designers". Negative keywords also
+    match their "-er" forms: "interior design" covers "Interior Designers".
+    """
+
+    def __init__(
+        self,
+        keywords,
+        weights: dict | None = None,
+        negative: dict | None = None,
+        min_score: float = 1.0,
+    ):
+        weights = weights or {}
+        self.weights = {" ".join(kw.lower().split()): float(weights.get(kw, 1.0)) for kw in keywords}
+        for kw, w in (negative or {}).items():
+            self.weights[" ".join(kw.lower().split())] = -abs(float(w))
+        self.min_score = min_score
+        # Every accepted form -> its keyword; a longer keyword keeps a form both could claim
+        self._forms = {}
+        for kw in sorted(self.weights, key=len, reverse=True):
+            for suffix in ("", "s", "er", "ers") if self.weights[kw] < 0 else ("", "s"):
+                self._forms.setdefault(kw + suffix, kw)
+        # Substrings every match contains: the prefilter before the regex
+        self._stems = tuple({kw.split()[0] for kw in self.weights if kw})
+        self._regex = re.compile(rf"\b({_trie_pattern(self._forms)})\b") if self._forms else None
+
+    def found(self, text: str) -> set[str]:
+        """Distinct keywords present in text."""
+        if not text or self._regex is None:
+            return set()
+        text = text.lower()
+        if not any(stem in text for stem in self._stems):
+            return set()
+        return {self._forms[" ".join(m.group(1).split())] for m in self._regex.finditer(text)}
+
+    def score(self, text: str) -> float:
+        return sum(self.weights.get(kw, 0.0) for kw in self.found(text))
+
+    def matches(self, text: str) -> bool:
+        return self._regex is not None and self.score(text) >= self.min_score
@@ -0,0 +1,140 @@
+"""
+Persistent cache of generated cover letters, keyed by a hash of everything
+that goes into the prompt, with size-based LRU eviction and hit/miss counters.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import (
+    LETTER_CACHE_DB,
+    LETTER_CACHE_MAX_BYTES,
+    ensure_data_dir,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS letters (
+    key TEXT PRIMARY KEY,
+    letter TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS letters_last_used ON letters (last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def letter_key(
+    instruction: str,
+    profile: str,
+    model_uri: str,
+    temperature: float,
+    job_title: str,
+    company: str,
+    job_description: str,
+) -> str:
+    """Content address of a letter: any change in profile, instruction or model gives a new key."""
+    h = hashlib.sha256()
+    for part in (
+        instruction,
+        profile,
+        model_uri,
+        repr(float(temperature)),
+        _normalize(job_title),
+        _normalize(company),
+        _normalize(job_description),
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LetterCache:
+    """Thread-safe: generate_cover_letter is called from worker threads."""
+
+    def __init__(self, path: Path = LETTER_CACHE_DB, max_bytes: int = LETTER_CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        ensure_data_dir()
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        try:
+            if not self._ready:
+                conn.executescript(_SCHEMA)
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> str | None:
+        if self.max_bytes <= 0:
+            return None
+        with self.lock, self._connect() as conn:
+            row = conn.execute("SELECT letter FROM letters WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE letters SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._count(conn, "hits")
+            return row[0]
+
+    def put(self, key: str, letter: str) -> None:
+        if self.max_bytes <= 0 or not letter:
+            return
+        size = len(letter.encode("utf-8"))
+        with self.lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO letters (key, letter, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, letter, size, time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM letters").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM letters ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM letters WHERE key = ?", stale)
+
+    def stats(self) -> dict:
+        """{"hits", "misses", "entries", "bytes"} since the cache was created."""
+        with self.lock, self._connect() as conn:
+            out = {"hits": 0, "misses": 0}
+            out.update(dict(conn.execute("SELECT name, value FROM stats")))
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM letters"
+            ).fetchone()
+            out["entries"] = entries
+            out["bytes"] = total
+            return out
+
+
+letter_cache = LetterCache()
@@ -0,0 +1,208 @@
+"""
+Run metrics: timing spans per stage (fetch, parse, filter, letter, send),
+per-board counters and LLM token usage, collected in process. A daily run
+writes them to RUN_REPORT_JSON; in daemon mode they are also served as
+Prometheus text on METRICS_PORT. Everything is cumulative since start.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (
+    METRICS_ADDR,
+    METRICS_PORT,
+    RUN_REPORT_JSON,
+    ensure_data_dir,
+)
+
+logger = logging.getLogger(__name__)
+
+SAMPLES = 2048  # durations kept per span for percentiles
+BOARD_FIELDS = ("fetches", "not_modified", "bytes", "jobs", "matches", "new", "errors", "seconds")
+SLOWEST_BOARDS = 10
+
+
+class _Span:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total": round(self.total, 4),
+            "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    """Thread-safe: fetches, letters and sends are timed from worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started = time.time()
+            self.spans: dict[str, _Span] = {}
+            self.counters: dict[str, float] = {}
+            self.boards: dict[str, dict] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = _Span()
+            span.add(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the block as one `name` span; failed blocks are timed too."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def board(self, url: str, **counts) -> None:
+        """Add to a board's counters (fields in BOARD_FIELDS)."""
+        with self.lock:
+            board = self.boards.setdefault(url, dict.fromkeys(BOARD_FIELDS, 0))
+            for field, value in counts.items():
+                board[field] += value
+
+    @contextmanager
+    def board_scope(self, url: str):
+        """Bytes fetched in this thread inside the block count for the board."""
+        previous = getattr(self._local, "board", None)
+        self._local.board = url
+        try:
+            yield
+        finally:
+            self._local.board = previous
+
+    def current_board(self) -> str | None:
+        return getattr(self._local, "board", None)
+
+    def add_bytes(self, size: int) -> None:
+        self.count("fetch_bytes", size)
+        board = self.current_board()
+        if board:
+            self.board(board, bytes=size)
+
+    def report(self) -> dict:
+        with self.lock:
+            boards = {u: dict(b, seconds=round(b["seconds"], 4)) for u, b in self.boards.items()}
+            report = {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "duration": round(time.time() - self.started, 3),
+                "spans": {name: span.summary() for name, span in sorted(self.spans.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "boards": boards,
+            }
+        report["slowest_boards"] = sorted(boards, key=lambda u: -boards[u]["seconds"])[:SLOWEST_BOARDS]
+        return report
+
+    def write_report(self, path=RUN_REPORT_JSON) -> None:
+        ensure_data_dir()
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        report = self.report()
+        lines = [
+            "# HELP jobs_bot_span_seconds Duration of pipeline stages.",
+            "# TYPE jobs_bot_span_seconds summary",
+        ]
+        for name, s in report["spans"].items():
+            label = f'span="{_escape(name)}"'
+            lines.append(f'jobs_bot_span_seconds{{{label},quantile="0.5"}} {s["p50"]}')
+            lines.append(f'jobs_bot_span_seconds{{{label},quantile="0.95"}} {s["p95"]}')
+            lines.append(f"jobs_bot_span_seconds_sum{{{label}}} {s['total']}")
+            lines.append(f"jobs_bot_span_seconds_count{{{label}}} {s['count']}")
+        for name, value in report["counters"].items():
+            metric = f"jobs_bot_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for field in BOARD_FIELDS:
+            metric = f"jobs_bot_board_{field}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for url, board in report["boards"].items():
+                lines.append(f'{metric}{{board="{_escape(url)}"}} {board[field]}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def usage_tokens(usage: dict | None) -> None:
+    """Count tokens from a Yandex completion's usage block (numbers come as strings)."""
+    if not usage:
+        return
+    for key, name in (
+        ("inputTextTokens", "llm_input_tokens"),
+        ("completionTokens", "llm_completion_tokens"),
+    ):
+        try:
+            metrics.count(name, int(usage.get(key) or 0))
+        except (TypeError, ValueError):
+            pass
+
+
+def serve_metrics(port: int = METRICS_PORT, addr: str = METRICS_ADDR) -> ThreadingHTTPServer | None:
+    """Serve GET /metrics in a background thread; None when port is 0. Call shutdown() to stop."""
+    if port <= 0:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Metrics on http://%s:%d/metrics", addr, port)
+    return server
+
+
+metrics = Metrics()
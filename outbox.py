@@ -0,0 +1,388 @@
+"""
+Persistent Telegram outbox: every new job is stored before its letter is
+written, and only marked delivered once Telegram acknowledged the message.
+A delivery claims the jobs it writes letters for, so two deliveries to one
+chat never write or send the same job.
+The sender respects per-chat and global flood limits, waits out RetryAfter
+and can merge several vacancies into one digest message (split at 4096 chars).
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from telegram.error import BadRequest, RetryAfter
+
+from config import (
+    OUTBOX_DB,
+    OUTBOX_DIGEST,
+    OUTBOX_MAX_ATTEMPTS,
+    ensure_data_dir,
+)
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n— — —\n\n"
+CHAT_INTERVAL = 1.0         # Telegram: about one message per second per chat
+EDIT_INTERVAL = 1.5         # a streamed letter is re-rendered at most this often
+GLOBAL_INTERVAL = 1.0 / 30  # and about 30 messages per second overall
+KEEP_SENT_DAYS = 7
+CLAIM_TIMEOUT = 6 * 3600  # a claim older than this was left by a process that died
+
+NEW, WRITING, READY, SENT, FAILED = "new", "writing", "ready", "sent", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    job TEXT NOT NULL,
+    text TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    sent_at REAL,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_chat_status ON outbox (chat_id, status);
+CREATE TABLE IF NOT EXISTS letter_budget (
+    chat_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, day)
+);
+"""
+
+
+@dataclass
+class OutboxItem:
+    id: int
+    chat_id: int
+    job: dict
+    text: str
+
+
+class Outbox:
+    """Use as a context manager; every change is committed immediately."""
+
+    def __init__(self, path: Path = OUTBOX_DB):
+        ensure_data_dir()
+        self.conn = sqlite3.connect(str(path), isolation_level=None)
+        self.conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")]
+        if "claimed_at" not in columns:
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN claimed_at REAL")
+        self.conn.execute(
+            "DELETE FROM outbox WHERE status = ? AND sent_at < ?",
+            (SENT, time.time() - KEEP_SENT_DAYS * 86400),
+        )
+
+    def __enter__(self) -> "Outbox":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.close()
+
+    def add_jobs(self, chat_id: int, jobs: list[dict]) -> None:
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO outbox (chat_id, job, status, created) VALUES (?, ?, ?, ?)",
+            ((chat_id, json.dumps(j, ensure_ascii=False), NEW, now) for j in jobs),
+        )
+
+    def _items(self, chat_id: int, status: str) -> list[OutboxItem]:
+        rows = self.conn.execute(
+            "SELECT id, chat_id, job, text FROM outbox WHERE chat_id = ? AND status = ? ORDER BY id",
+            (chat_id, status),
+        )
+        return [OutboxItem(r[0], r[1], json.loads(r[2]), r[3]) for r in rows]
+
+    def add_text(self, chat_id: int, text: str) -> None:
+        """A message that needs no letter, e.g. the list of jobs over the daily budget."""
+        self.conn.execute(
+            "INSERT INTO outbox (chat_id, job, text, status, created) VALUES (?, '{}', ?, ?, ?)",
+            (chat_id, text, READY, time.time()),
+        )
+
+    def letters_used(self, chat_id: int, day: str) -> int:
+        row = self.conn.execute(
+            "SELECT used FROM letter_budget WHERE chat_id = ? AND day = ?", (chat_id, day)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def use_letters(self, chat_id: int, day: str, count: int) -> None:
+        self.conn.execute(
+            "INSERT INTO letter_budget (chat_id, day, used) VALUES (?, ?, ?) "
+            "ON CONFLICT (chat_id, day) DO UPDATE SET used = used + excluded.used",
+            (chat_id, day, count),
+        )
+        self.conn.execute(
+            "DELETE FROM letter_budget WHERE day < ?",
+            (time.strftime("%Y-%m-%d", time.localtime(time.time() - KEEP_SENT_DAYS * 86400)),),
+        )
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def replace_with_text(self, chat_id: int, item_ids: list[int], text: str) -> None:
+        """Turn waiting jobs into one message that needs no letter (e.g. a list of links), atomically."""
+        with self._transaction():
+            self.add_text(chat_id, text)
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", ((i,) for i in item_ids))
+
+    def claim_waiting(self, chat_id: int) -> list[OutboxItem]:
+        """
+        Take the chat's jobs that have no message yet, including ones left over
+        from earlier runs, for writing letters. Claimed items are not returned
+        again until released or CLAIM_TIMEOUT passes.
+        """
+        now = time.time()
+        with self._transaction():
+            rows = self.conn.execute(
+                "SELECT id, chat_id, job, text FROM outbox WHERE chat_id = ? "
+                "AND (status = ? OR (status = ? AND claimed_at < ?)) ORDER BY id",
+                (chat_id, NEW, WRITING, now - CLAIM_TIMEOUT),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE outbox SET status = ?, claimed_at = ? WHERE id = ?",
+                ((WRITING, now, r[0]) for r in rows),
+            )
+        return [OutboxItem(r[0], r[1], json.loads(r[2]), r[3]) for r in rows]
+
+    def release(self, item_ids: list[int]) -> None:
+        """Give claimed items without a letter back, e.g. when the run was cancelled."""
+        self.conn.executemany(
+            "UPDATE outbox SET status = ? WHERE id = ? AND status = ?",
+            ((NEW, i, WRITING) for i in item_ids),
+        )
+
+    def pending_chats(self) -> set[int]:
+        """Chats with jobs waiting for a letter or messages waiting to be sent."""
+        rows = self.conn.execute(
+            "SELECT DISTINCT chat_id FROM outbox WHERE status IN (?, ?)", (NEW, READY)
+        )
+        return {r[0] for r in rows}
+
+    def ready(self, chat_id: int) -> list[OutboxItem]:
+        return self._items(chat_id, READY)
+
+    def set_text(self, item_id: int, text: str) -> bool:
+        """Store the message of a claimed item. False if the item is no longer claimed (then send nothing)."""
+        cur = self.conn.execute(
+            "UPDATE outbox SET text = ?, status = ? WHERE id = ? AND status = ?", (text, READY, item_id, WRITING)
+        )
+        return cur.rowcount == 1
+
+    def mark_sent(self, item_ids: list[int]) -> None:
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE outbox SET status = ?, sent_at = ? WHERE id = ?",
+            ((SENT, now, i) for i in item_ids),
+        )
+
+    def mark_failed_attempt(self, item_ids: list[int]) -> None:
+        """Count a failed send; give up on an item after OUTBOX_MAX_ATTEMPTS."""
+        self.conn.executemany(
+            "UPDATE outbox SET attempts = attempts + 1, "
+            "status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END WHERE id = ?",
+            ((OUTBOX_MAX_ATTEMPTS, FAILED, i) for i in item_ids),
+        )
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Split at paragraph, then line, then hard boundaries so each part fits in one message."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip("\n")
+    if text:
+        parts.append(text)
+    return parts
+
+
+def build_batches(items: list[OutboxItem], digest: bool = OUTBOX_DIGEST) -> list[tuple[list[int], list[str]]]:
+    """
+    Group items into (item_ids, message_parts). With digest, consecutive items
+    that fit together in one message are merged.
+    """
+    batches = []
+    for item in items:
+        if digest and batches:
+            ids, parts = batches[-1]
+            merged = parts[-1] + DIGEST_SEPARATOR + item.text
+            if len(parts) == 1 and len(merged) <= MESSAGE_LIMIT:
+                batches[-1] = (ids + [item.id], [merged])
+                continue
+        batches.append(([item.id], split_message(item.text)))
+    return batches
+
+
+class TelegramSender:
+    """Rate-limited sender shared by everything that talks to one bot."""
+
+    _by_bot: dict = {}
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.global_lock = asyncio.Lock()
+        self.last_global = 0.0
+        self.chat_locks: dict[int, asyncio.Lock] = {}
+        self.last_chat: dict[int, float] = {}
+
+    @classmethod
+    def for_bot(cls, bot) -> "TelegramSender":
+        sender = cls._by_bot.get(id(bot))
+        if sender is None or sender.bot is not bot:
+            sender = cls._by_bot[id(bot)] = cls(bot)
+        return sender
+
+    async def _wait_turn(self, chat_id: int) -> None:
+        # Reserve the chat's next slot before sleeping (no await in between, so
+        # this is atomic on the loop): concurrent senders to one chat, e.g.
+        # several streamed letters, queue up CHAT_INTERVAL apart
+        now = time.monotonic()
+        slot = max(now, self.last_chat.get(chat_id, 0.0) + CHAT_INTERVAL)
+        self.last_chat[chat_id] = slot
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        async with self.global_lock:
+            wait = self.last_global + GLOBAL_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.last_global = time.monotonic()
+
+    async def send(self, chat_id: int, text: str, max_flood_waits: int = 5, **kwargs):
+        """Send one message, waiting out flood control; other errors propagate. Returns the Message."""
+        return await self._call(
+            chat_id, lambda: self.bot.send_message(chat_id=chat_id, text=text, **kwargs), max_flood_waits
+        )
+
+    async def edit(self, chat_id: int, message_id: int, text: str, max_flood_waits: int = 5, **kwargs) -> None:
+        """Replace the text of a sent message; edits count against the same flood limits as sends."""
+        try:
+            await self._call(
+                chat_id,
+                lambda: self.bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id, **kwargs),
+                max_flood_waits,
+                name="edit",
+            )
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+
+    async def _call(self, chat_id: int, request, max_flood_waits: int, name: str = "send"):
+        """request() with pacing and flood waits; telegram.<name> spans the whole call, waits included."""
+        with metrics.span(f"telegram.{name}"):
+            for attempt in range(max_flood_waits + 1):
+                with metrics.span("telegram.wait"):
+                    await self._wait_turn(chat_id)
+                try:
+                    return await request()
+                except RetryAfter as e:
+                    if attempt == max_flood_waits:
+                        raise
+                    retry_after = e.retry_after
+                    seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+                    logger.info("Flood control for chat %s, waiting %.0f s", chat_id, seconds)
+                    metrics.count("telegram_flood_waits")
+                    self.last_chat[chat_id] = max(self.last_chat.get(chat_id, 0.0), time.monotonic() + seconds)
+
+    async def flush(self, outbox: Outbox, chat_id: int, digest: bool = OUTBOX_DIGEST) -> int:
+        """Send every ready item of the chat. Returns the number of items delivered."""
+        lock = self.chat_locks.setdefault(chat_id, asyncio.Lock())
+        delivered = 0
+        async with lock:
+            for ids, parts in build_batches(outbox.ready(chat_id), digest):
+                try:
+                    for part in parts:
+                        await self.send(chat_id, part, parse_mode="HTML", disable_web_page_preview=True)
+                except Exception as e:
+                    logger.warning("Send error: %s", e)
+                    outbox.mark_failed_attempt(ids)
+                    continue
+                outbox.mark_sent(ids)
+                delivered += len(ids)
+        return delivered
+
+
+class LiveMessage:
+    """
+    A message that grows while its letter is streamed: the first update sends
+    it, later ones edit it at most every EDIT_INTERVAL. Updates arriving in
+    between are coalesced, only the newest text is shown.
+    """
+
+    def __init__(self, sender: TelegramSender, chat_id: int, interval: float = EDIT_INTERVAL, **kwargs):
+        self.sender = sender
+        self.chat_id = chat_id
+        self.interval = interval
+        self.kwargs = kwargs
+        self.message_id: int | None = None
+        self.shown = ""
+        self._pending: str | None = None
+        self._task: asyncio.Task | None = None
+        self._failed = False
+
+    def update(self, text: str) -> None:
+        """Show text soon; call from the event loop. Never blocks."""
+        if self._failed:
+            return
+        self._pending = split_message(text)[0] if text else ""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        try:
+            while self._pending is not None:
+                text, self._pending = self._pending, None
+                if not text or text == self.shown:
+                    continue
+                await self._show(text)
+                await asyncio.sleep(self.interval)
+        except Exception as e:
+            # The final text is still delivered by finish() or the outbox
+            logger.warning("Live update error: %s", e)
+            self._failed = True
+
+    async def _show(self, text: str) -> None:
+        if self.message_id is None:
+            message = await self.sender.send(self.chat_id, text, **self.kwargs)
+            self.message_id = message.message_id
+        else:
+            await self.sender.edit(self.chat_id, self.message_id, text, **self.kwargs)
+        self.shown = text
+
+    def cancel(self) -> None:
+        """Stop showing updates, e.g. when the delivery was cancelled; later updates are ignored."""
+        self._failed = True
+        self._pending = None
+        if self._task is not None:
+            self._task.cancel()
+
+    async def finish(self, text: str) -> None:
+        """Show the final text; parts beyond one message are sent as new messages. Errors propagate."""
+        self._pending = None
+        if self._task is not None:
+            await self._task
+        parts = split_message(text)
+        if parts and parts[0] != self.shown:
+            await self._show(parts[0])
+        for part in parts[1:]:
+            await self.sender.send(self.chat_id, part, **self.kwargs)
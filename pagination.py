@@ -0,0 +1,169 @@
+"""
+Pagination discovery for listing pages: rel="next" links, "Next" / "Load more"
+buttons, ?page=N style links and the JSON endpoints behind "load more"
+buttons. Works on the raw body with regexes, so finding the next pages costs
+no extra DOM. Only pages on the board's own host are followed.
+"""
+import html as html_lib
+import json
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+PAGE_PARAMS = ("page", "p", "pg", "pagenum", "page_number")
+OFFSET_PARAMS = ("offset", "start", "from", "skip")
+
+_A_RE = re.compile(r"<a\b([^>]*)>(.*?)</a>", re.I | re.S)
+_LINK_RE = re.compile(r"<link\b([^>]*)>", re.I)
+_ATTR_RE = re.compile(r"([\w:-]+)\s*=\s*(\"[^\"]*\"|'[^']*')", re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_NEXT_TEXT_RE = re.compile(
+    r"^(next|next page|load more|show more|more jobs|see more|view more"
+    r"|далее|дальше|следующая|вперёд|вперед|показать ещё|показать еще|загрузить ещё)$",
+    re.I,
+)
+# Also used by menus and "read more" links: only trusted on the listing's own
+# path or inside a pagination container
+_BARE_NEXT_TEXT_RE = re.compile(r"^(more|older|ещё|еще|›|»|→|>|>>)$", re.I)
+_PAGER_RE = re.compile(
+    r"<(nav|div|ul|ol|section|p|span)\b[^>]*\b(?:class|id|aria-label|role)\s*=\s*"
+    r"[\"'][^\"']*(?:pagination|pager|paging)[^\"']*[\"'][^>]*>",
+    re.I,
+)
+_DATA_URL_RE = re.compile(
+    r"\bdata-(?:next|next-url|next-page|load-more|load-more-url|more-url)\s*=\s*(\"[^\"]*\"|'[^']*')",
+    re.I,
+)
+_JSON_NEXT_KEYS = ("next", "next_url", "nextUrl", "next_page_url", "nextPageUrl", "load_more_url")
+
+
+def _attrs(tag: str) -> dict:
+    return {k.lower(): html_lib.unescape(v[1:-1]) for k, v in _ATTR_RE.findall(tag)}
+
+
+def normalize_page_url(url: str) -> str:
+    """Drop the fragment so the same page is not queued twice."""
+    return urlunparse(urlparse(url)._replace(fragment=""))
+
+
+def _page_number(url: str) -> tuple[str, int] | None:
+    for key, value in parse_qsl(urlparse(url).query, keep_blank_values=True):
+        if key.lower() in PAGE_PARAMS + OFFSET_PARAMS and value.isdigit():
+            return key, int(value)
+    return None
+
+
+def _with_param(url: str, key: str, value: int) -> str:
+    p = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(p.query, keep_blank_values=True) if k != key]
+    query.append((key, str(value)))
+    return urlunparse(p._replace(query=urlencode(query), fragment=""))
+
+
+def _pager_spans(markup: str) -> list[tuple[int, int]]:
+    """(start, end) of pagination containers, up to their first closing tag."""
+    spans = []
+    for m in _PAGER_RE.finditer(markup):
+        end = markup.find(f"</{m.group(1)}", m.end())
+        spans.append((m.end(), end if end != -1 else len(markup)))
+    return spans
+
+
+def _same_listing(url: str, page_url: str) -> bool:
+    a, b = urlparse(url), urlparse(page_url)
+    return a.netloc.lower() == b.netloc.lower() and a.path.rstrip("/") == b.path.rstrip("/")
+
+
+def unwrap_json_page(body: str) -> tuple[str, list[str]]:
+    """
+    "Load more" endpoints often answer JSON like {"html": "...", "next": "..."}.
+    Returns (html fragments joined, next URLs); ("", []) if body is not JSON.
+    """
+    text = body.lstrip()
+    if not text.startswith(("{", "[")):
+        return "", []
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return "", []
+    fragments, nexts = [], []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in _JSON_NEXT_KEYS and isinstance(value, str) and value:
+                    nexts.append(value)
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+        elif isinstance(node, str) and "<a" in node:
+            fragments.append(node)
+
+    walk(data)
+    return "\n".join(fragments), nexts
+
+
+def next_page_urls(body: str, page_url: str, had_jobs: bool = True) -> list[str]:
+    """
+    Candidate next pages of a listing, in page order and on the same host.
+    had_jobs: whether page_url yielded jobs; only then is page N+1 guessed
+    from a ?page=N URL.
+    """
+    host = urlparse(page_url).netloc.lower()
+    found = []
+
+    def add(href: str) -> None:
+        href = (href or "").strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:")):
+            return
+        url = normalize_page_url(urljoin(page_url, href))
+        if urlparse(url).netloc.lower() == host and url != normalize_page_url(page_url):
+            found.append(url)
+
+    fragment, json_nexts = unwrap_json_page(body)
+    for href in json_nexts:
+        add(href)
+    markup = fragment or body
+
+    for tag in _LINK_RE.findall(markup):
+        attrs = _attrs(tag)
+        if "next" in attrs.get("rel", "").lower().split():
+            add(attrs.get("href", ""))
+    current = _page_number(page_url)
+    pagers = None
+    for m in _A_RE.finditer(markup):
+        tag, inner = m.groups()
+        attrs = _attrs(tag)
+        href = attrs.get("href", "")
+        label = " ".join(html_lib.unescape(_TAG_RE.sub(" ", inner)).split())
+        if "next" in attrs.get("rel", "").lower().split() or _NEXT_TEXT_RE.match(label):
+            add(href)
+            continue
+        if _BARE_NEXT_TEXT_RE.match(label):
+            if pagers is None:
+                pagers = _pager_spans(markup)
+            if _same_listing(urljoin(page_url, href), page_url) or any(
+                start <= m.start() < end for start, end in pagers
+            ):
+                add(href)
+            continue
+        # Numbered pagination: links to later pages of the same listing
+        number = _page_number(urljoin(page_url, href)) if href else None
+        if number and _same_listing(urljoin(page_url, href), page_url):
+            first = 1 if number[0].lower() in PAGE_PARAMS else 0
+            if current is None and number[1] > first:
+                add(href)
+            elif current is not None and number[0] == current[0] and number[1] > current[1]:
+                add(href)
+    # "Load more" buttons are often not links: <button data-next-url="...">
+    for m in _DATA_URL_RE.finditer(markup):
+        add(html_lib.unescape(m.group(1)[1:-1]))
+    if had_jobs and current is not None and current[0].lower() in PAGE_PARAMS:
+        add(_with_param(page_url, current[0], current[1] + 1))
+
+    def order(url: str):
+        number = _page_number(url)
+        return number[1] if number else 0
+
+    return sorted(dict.fromkeys(found), key=order)
@@ -0,0 +1,107 @@
+"""
+Process pool for parsing large pages. BeautifulSoup is pure Python, so
+threads that fetch in parallel still parse one at a time under the GIL;
+pages of PARSE_POOL_MIN_BYTES and more are parsed in worker processes instead.
+A worker gets the page as UTF-8 bytes and sends jobs back as tuples, which
+pickle smaller and faster than dicts. Smaller pages are parsed inline, where
+the round trip would cost more than it saves.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from config import (
+    PARSE_PROCESSES,
+    PARSE_POOL_MIN_BYTES,
+)
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_FIELDS = ("url", "title", "team", "company", "description")
+
+_pool: ProcessPoolExecutor | None = None
+_broken = False
+_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    return PARSE_PROCESSES if PARSE_PROCESSES > 0 else (os.cpu_count() or 1)
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if pool_size() <= 1 or _broken:
+        return None
+    with _lock:
+        if _pool is None:
+            # forkserver/spawn: forking a process whose threads may hold locks is unsafe
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=context)
+        return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_parse_pool)
+
+
+def pack_jobs(jobs: list[dict]) -> list[tuple]:
+    """Jobs as (url, title, team, company, description, extra fields or None)."""
+    out = []
+    for j in jobs:
+        extra = {k: v for k, v in j.items() if k not in JOB_FIELDS} or None
+        out.append(tuple(j.get(k, "") for k in JOB_FIELDS) + (extra,))
+    return out
+
+
+def unpack_jobs(rows: list[tuple]) -> list[dict]:
+    out = []
+    for row in rows:
+        job = dict(zip(JOB_FIELDS, row))
+        if row[-1]:
+            job.update(row[-1])
+        out.append(job)
+    return out
+
+
+def _parse_in_worker(parse: Callable, body: bytes, url: str) -> list[tuple]:
+    return pack_jobs(parse(body.decode("utf-8"), url))
+
+
+def parse_page(parse: Callable[[str, str], list[dict]], html: str, url: str) -> list[dict]:
+    """
+    parse(html, url), in a worker process when the page is large. parse must
+    be a module-level function so it can be sent to the worker.
+    """
+    # Characters never outnumber UTF-8 bytes, so this needs no encoding for small pages
+    pool = _get_pool() if len(html) >= PARSE_POOL_MIN_BYTES else None
+    if pool is None:
+        return parse(html, url)
+    metrics.count("parse_offloaded")
+    try:
+        return unpack_jobs(pool.submit(_parse_in_worker, parse, html.encode("utf-8"), url).result())
+    except pickle.PicklingError:
+        logger.warning("%s cannot be sent to the parse pool, parsing inline", getattr(parse, "__name__", parse))
+        return parse(html, url)
+    except BrokenProcessPool:
+        # A worker died or could not start: parse inline from now on rather than respawn per page
+        global _broken
+        if not _broken:
+            _broken = True
+            logger.warning("Parse pool broke, parsing pages inline from now on")
+        shutdown_parse_pool()
+        return parse(html, url)
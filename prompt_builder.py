@@ -0,0 +1,86 @@
+"""
+Compact prompts for cover letters: the parts of the profile that matter for
+a job instead of the whole profile, and job descriptions without boilerplate
+(equal-opportunity statements, benefits, cookie notices) cut to a budget.
+Pure text functions; the profile digest itself is written in yandex_gpt.py.
+"""
+import re
+
+from relevance import score_jobs
+
+DIGEST_INSTRUCTION = (
+    "Summarise this candidate profile for a cover letter writer in at most 120 words: "
+    "current role, years of experience, companies, strongest measurable achievements, "
+    "key skills and languages. Keep names and numbers exactly as written. "
+    "Output only the summary."
+)
+
+_SECTION_BREAK_RE = re.compile(r"\n\s*\n|\n(?=---)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\s+(?=[•·▪]\s)|\s+(?=- [A-ZА-Я])")
+_BOILERPLATE_RE = re.compile(
+    r"equal opportunit|equal employment|affirmative action|without regard to|regardless of"
+    r"|reasonable accommodation|protected veteran|sexual orientation|gender identity|national origin"
+    r"|privacy (?:policy|notice)|cookie|we use cookies|recruitment fraud|do not accept unsolicited"
+    r"|agency submissions|e-verify|background check|apply now|click apply|share this job"
+    r"|health insurance|dental|401\s?\(?k|paid time off|parental leave|wellness|gym membership"
+    r"|stock options|equity package|snacks|perks|our benefits",
+    re.I,
+)
+_CUE_RE = re.compile(
+    r"\b(you will|you'll|responsib|requirement|qualification|experience|skills?|must|looking for"
+    r"|what you|about the role|the role|own|lead|design|portfolio|years|proficien|familiar"
+    r"|обязанност|требовани|опыт|задачи|ищем|будешь|будете)",
+    re.I,
+)
+
+
+def profile_sections(profile: str) -> list[str]:
+    """Paragraphs and "--- Company — Role" blocks of the profile, in order."""
+    return [s.strip() for s in _SECTION_BREAK_RE.split(profile or "") if s.strip()]
+
+
+def select_profile(profile: str, job_text: str, max_chars: int, keep_intro: bool = True) -> str:
+    """
+    The profile sections that best match the job (BM25), in profile order and
+    within max_chars. The intro (everything before the first "---" block) is
+    kept unless keep_intro is off. A profile that fits is returned whole.
+    """
+    if max_chars <= 0 or len(profile) <= max_chars:
+        return profile
+    sections = profile_sections(profile)
+    first_block = next((i for i, s in enumerate(sections) if s.startswith("---")), len(sections))
+    chosen = set(range(first_block)) if keep_intro else set()
+    used = sum(len(sections[i]) + 2 for i in chosen)
+    scores = score_jobs([{"description": s} for s in sections], job_text)
+    for i in sorted(range(len(sections)), key=lambda i: -scores[i]):
+        if i in chosen or scores[i] <= 0:
+            continue
+        if used + len(sections[i]) + 2 <= max_chars:
+            chosen.add(i)
+            used += len(sections[i]) + 2
+    return "\n\n".join(sections[i] for i in sorted(chosen))
+
+
+def trim_description(text: str, max_chars: int) -> str:
+    """
+    Job description without boilerplate sentences; when still over max_chars,
+    sentences about the role and its requirements are kept first. Order is kept.
+    """
+    text = (text or "").strip()
+    if max_chars <= 0:
+        return text
+    # Scraped pages often repeat a block; each sentence is kept once
+    sentences = list(dict.fromkeys(s.strip() for s in _SENTENCE_RE.split(text) if s.strip()))
+    kept = [s for s in sentences if not _BOILERPLATE_RE.search(s)] or sentences
+    if sum(len(s) + 1 for s in kept) <= max_chars:
+        return " ".join(kept)
+    # The opening usually says what the role is; after that, sentences with role cues win
+    order = [0] + sorted(range(1, len(kept)), key=lambda i: (not _CUE_RE.search(kept[i]), i))
+    chosen, used = set(), 0
+    for i in order:
+        if used + len(kept[i]) + 1 <= max_chars:
+            chosen.add(i)
+            used += len(kept[i]) + 1
+    if not chosen:
+        return kept[0][:max_chars]
+    return " ".join(kept[i] for i in sorted(chosen))
@@ -0,0 +1,61 @@
+"""
+Relevance ranking of new jobs against the candidate profile: Okapi BM25
+with the profile as the query and the batch of new jobs as the corpus.
+Pure Python; a batch is a few hundred jobs at most, so no NumPy is needed.
+"""
+import math
+import re
+from collections import Counter
+
+K1 = 1.2
+B = 0.75
+TITLE_BOOST = 3  # title words count this many times
+MAX_QUERY_TF = 3  # a word repeated all over the profile should not dominate
+
+_WORD_RE = re.compile(r"[^\W\d_][\w+#-]*", re.U)
+STOPWORDS = frozenset("""
+a an and are as at be but by can for from has have he her his i in into is it its me my of on or our
+she so that the their them they this to was we were will with you your who what when where which
+about after all also any been being both each had how if more most no not only other out over same
+some such than then there these those through under up very via would should could do does did
+и в во на с со по к ко от до за из у о об а но или что как это не для при же ли бы мы вы он она они
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    words = (w.lower().strip("-") for w in _WORD_RE.findall(text or ""))
+    return [w for w in words if len(w) > 1 and w not in STOPWORDS]
+
+
+def _job_terms(job: dict) -> list[str]:
+    title = tokenize(job.get("title", ""))
+    body = tokenize(" ".join(str(job.get(k, "")) for k in ("team", "seniority", "description")))
+    return title * TITLE_BOOST + body
+
+
+def score_jobs(jobs: list[dict], profile: str) -> list[float]:
+    """BM25 score of every job for the profile, in the order of jobs."""
+    query = {t: min(n, MAX_QUERY_TF) for t, n in Counter(tokenize(profile)).items()}
+    if not jobs or not query:
+        return [0.0] * len(jobs)
+    docs = [Counter(_job_terms(j)) for j in jobs]
+    lengths = [sum(d.values()) for d in docs]
+    avg_len = sum(lengths) / len(docs) or 1.0
+    df = Counter(t for d in docs for t in d if t in query)
+    n = len(docs)
+    idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+    scores = []
+    for doc, length in zip(docs, lengths):
+        norm = K1 * (1 - B + B * length / avg_len)
+        scores.append(sum(
+            idf[t] * query[t] * doc[t] * (K1 + 1) / (doc[t] + norm)
+            for t in idf if t in doc
+        ))
+    return scores
+
+
+def rank_jobs(jobs: list[dict], profile: str) -> list[dict]:
+    """Jobs ordered from the best to the worst match; ties keep scrape order."""
+    scores = score_jobs(jobs, profile)
+    order = sorted(range(len(jobs)), key=lambda i: -scores[i])
+    return [jobs[i] for i in order]
@@ -2,17 +2,30 @@
 """
 Синхронизация текущей директории в бакет Yandex Object Storage (S3-совместимый API).
 Использование: из корня репо запустить с переменными окружения
-  S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_BUCKET.
+  S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_BUCKET
+  (необязательно S3_SYNC_WORKERS — сколько файлов загружать параллельно, по умолчанию 8).
+Синхронизация инкрементальная: бакет читается одним листингом, и загружаются только
+файлы, у которых размер или MD5 (ETag) отличается от объекта в бакете.
 """
+import hashlib
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 
+# Файлы больше PART_SIZE грузятся multipart-ом частями этого размера, потоково с диска.
+# Тот же размер части используется при расчёте ETag, чтобы сравнивать такие файлы с бакетом.
+PART_SIZE = 8 * 1024 * 1024
+DELETE_BATCH = 1000  # предел delete_objects за один запрос
+WORKERS = int(os.environ.get("S3_SYNC_WORKERS") or "8")
+
+# data/ — состояние бота (очередь с письмами и chat id, история, кэши), в публичный бакет не попадает
 EXCLUDE = re.compile(
-    r"^\.git(/|$)|^\.env$|\.venv/|venv/|__pycache__/|\.pyc$|\.DS_Store|^\.github/|\.log$"
+    r"^\.git(/|$)|^\.env$|\.venv/|venv/|__pycache__/|\.pyc$|\.DS_Store|^\.github/|\.log$|^data/"
 )
 
 
@@ -27,6 +40,55 @@ def _clean(s: str) -> str:
     return "".join(s.split())
 
 
+def local_files(root: Path) -> dict[str, Path]:
+    """Ключ -> путь для всех файлов, которые надо залить; один обход, пропущенные папки не обходятся."""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        dirnames[:] = [d for d in dirnames if not should_skip(prefix + d + "/")]
+        for name in filenames:
+            key = prefix + name
+            if not should_skip(key):
+                files[key] = Path(dirpath) / name
+    return files
+
+
+def remote_objects(client, bucket: str) -> dict[str, tuple[str, int]]:
+    """Ключ -> (ETag без кавычек, размер) для всех объектов бакета."""
+    objects = {}
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket):
+        for obj in page.get("Contents") or []:
+            objects[obj["Key"]] = (obj.get("ETag", "").strip('"'), obj.get("Size", -1))
+    return objects
+
+
+def file_etag(path: Path, multipart: bool = False, part_size: int = PART_SIZE) -> str:
+    """ETag, который S3 даёт файлу: MD5 целиком или, для multipart, MD5 от MD5 частей и их число."""
+    if not multipart:
+        h = hashlib.md5()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    digests = []
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(part_size), b""):
+            digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def needs_upload(path: Path, remote) -> bool:
+    """Файл новый или отличается от объекта в бакете: сначала по размеру, потом по ETag."""
+    if remote is None:
+        return True
+    etag, size = remote
+    if path.stat().st_size != size:
+        return True
+    return file_etag(path, multipart="-" in etag) != etag
+
+
 def main():
     # Секреты из GitHub могут содержать \r\n или пробелы — убираем всё лишнее
     ak = _clean(os.environ.get("S3_ACCESS_KEY_ID") or "")
@@ -51,33 +113,43 @@ def main():
     )
 
     root = Path(".").resolve()
-    for path in root.rglob("*"):
-        if not path.is_file():
-            continue
-        rel = path.relative_to(root)
-        key = str(rel).replace("\\", "/")
-        if should_skip(key):
-            continue
-        content = path.read_bytes()
-        client.put_object(Bucket=bucket, Key=key, Body=content)
-        print(key)
-
-    # Список ключей в бакете — удалить те, которых нет локально
-    paginator = client.get_paginator("list_objects_v2")
-    remote_keys = set()
-    for page in paginator.paginate(Bucket=bucket):
-        for obj in page.get("Contents") or []:
-            remote_keys.add(obj["Key"])
-    local_keys = set()
-    for path in root.rglob("*"):
-        if path.is_file():
-            rel = path.relative_to(root)
-            key = str(rel).replace("\\", "/")
-            if not should_skip(key):
-                local_keys.add(key)
-    for key in remote_keys - local_keys:
-        client.delete_object(Bucket=bucket, Key=key)
-        print(f"deleted {key}")
+    local = local_files(root)
+    remote = remote_objects(client, bucket)
+    transfer = TransferConfig(multipart_threshold=PART_SIZE, multipart_chunksize=PART_SIZE, max_concurrency=4)
+
+    def sync(key: str):
+        path = local[key]
+        if not needs_upload(path, remote.get(key)):
+            return None
+        client.upload_file(str(path), bucket, key, Config=transfer)
+        return key
+
+    uploaded = 0
+    with ThreadPoolExecutor(max_workers=max(1, WORKERS)) as pool:
+        for key in pool.map(sync, sorted(local)):
+            if key:
+                uploaded += 1
+                print(key)
+
+    # Удалить из бакета то, чего нет локально, пачками по DELETE_BATCH
+    stale = sorted(set(remote) - set(local))
+    failed = 0
+    for start in range(0, len(stale), DELETE_BATCH):
+        batch = stale[start:start + DELETE_BATCH]
+        response = client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+        )
+        errors = {e["Key"]: e.get("Message", "") for e in response.get("Errors") or []}
+        for key in batch:
+            if key in errors:
+                failed += 1
+                print(f"delete failed {key}: {errors[key]}")
+            else:
+                print(f"deleted {key}")
+    print(f"{uploaded} uploaded, {len(local) - uploaded} unchanged, {len(stale) - failed} deleted")
+    if failed:
+        raise SystemExit(f"{failed} objects could not be deleted")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+"""
+Seen-jobs store on SQLite: indexed membership checks, batched inserts,
+first/last seen timestamps and TTL eviction of postings that disappeared.
+Content fingerprints of sent jobs are kept alongside for duplicate detection.
+Each subscriber has its own scope; the original single-user history is scope "".
+"""
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from config import (
+    SEEN_DB,
+    SEEN_JOBS_JSON,
+    SEEN_TTL_DAYS,
+    ensure_data_dir,
+)
+from job_dedupe import Fingerprint, canonical_url
+
+DAY = 24 * 60 * 60
+# last_seen is only rewritten once it is this old, so a run that finds
+# nothing new leaves the database file untouched
+TOUCH_INTERVAL = 7 * DAY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    scope TEXT NOT NULL DEFAULT '',
+    job_id TEXT NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    PRIMARY KEY (scope, job_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seen_last_seen ON seen (last_seen);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    scope TEXT NOT NULL DEFAULT '',
+    job_id TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    company TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    PRIMARY KEY (scope, job_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fingerprints_title ON fingerprints (scope, title_key);
+"""
+
+# Tables created before scopes existed are rebuilt with scope ''
+_UNSCOPED_COLUMNS = {
+    "seen": "job_id, first_seen, last_seen",
+    "fingerprints": "job_id, title_key, company, signature, created",
+}
+
+
+def _add_scope_column(conn: sqlite3.Connection) -> None:
+    for table, columns in _UNSCOPED_COLUMNS.items():
+        names = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if names and "scope" not in names:
+            conn.execute(f"DROP INDEX IF EXISTS {table}_last_seen")
+            conn.execute(f"DROP INDEX IF EXISTS {table}_title")
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_unscoped")
+    conn.executescript(_SCHEMA)
+    for table, columns in _UNSCOPED_COLUMNS.items():
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{table}_unscoped",)
+        ).fetchone()
+        if exists:
+            conn.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_unscoped")
+            conn.execute(f"DROP TABLE {table}_unscoped")
+    conn.commit()
+
+
+class SeenStore:
+    """Use as a context manager; changes are committed on exit."""
+
+    def __init__(self, path: Path = SEEN_DB, ttl_days: int = SEEN_TTL_DAYS, scope: str = ""):
+        ensure_data_dir()
+        self.path = Path(path)
+        self.ttl = ttl_days * DAY
+        self.scope = scope
+        self.conn = sqlite3.connect(str(self.path), timeout=10)
+        _add_scope_column(self.conn)
+
+    def __enter__(self) -> "SeenStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.conn.commit()
+        self.conn.close()
+
+    def __contains__(self, job_id: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM seen WHERE scope = ? AND job_id = ?", (self.scope, job_id)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM seen WHERE scope = ?", (self.scope,)
+        ).fetchone()[0]
+
+    def add_many(self, job_ids, now: float | None = None) -> None:
+        """Insert new ids; refresh last_seen of known ids (at most once per TOUCH_INTERVAL)."""
+        now = int(now if now is not None else time.time())
+        self.conn.executemany(
+            "INSERT INTO seen (scope, job_id, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (scope, job_id) DO UPDATE SET last_seen = excluded.last_seen "
+            "WHERE seen.last_seen < excluded.last_seen - ?",
+            ((self.scope, job_id, now, now, TOUCH_INTERVAL) for job_id in dict.fromkeys(job_ids) if job_id),
+        )
+
+    def add_fingerprints(self, items, now: float | None = None) -> None:
+        """Store (job_id, Fingerprint) pairs of jobs that were sent."""
+        now = int(now if now is not None else time.time())
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO fingerprints (scope, job_id, title_key, company, signature, created) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (self.scope, job_id, fp.title_key, fp.company, " ".join(format(x, "x") for x in fp.signature), now)
+                for job_id, fp in items
+                if job_id and fp.title_key
+            ),
+        )
+
+    def fingerprint_titles(self) -> set[str]:
+        """Title keys of stored fingerprints with a signature; find_duplicate can only match these."""
+        rows = self.conn.execute(
+            "SELECT DISTINCT title_key FROM fingerprints WHERE scope = ? AND signature != ''", (self.scope,)
+        )
+        return {r[0] for r in rows}
+
+    def find_duplicate(self, fp: Fingerprint) -> str | None:
+        """
+        job_id of a stored job that fp duplicates, if any. History is kept for
+        months, so only near-identical descriptions count, not title and company.
+        """
+        if not fp.title_key or not fp.signature:
+            return None
+        rows = self.conn.execute(
+            "SELECT job_id, company, signature FROM fingerprints WHERE scope = ? AND title_key = ?",
+            (self.scope, fp.title_key),
+        )
+        for job_id, company, signature in rows:
+            other = Fingerprint(
+                fp.title_key,
+                company,
+                tuple(int(x, 16) for x in signature.split()),
+            )
+            if fp.is_duplicate_of(other, by_company=False):
+                return job_id
+        return None
+
+    def evict_expired(self, now: float | None = None) -> int:
+        """Forget ids not seen on any board for ttl_days. Returns number removed."""
+        if self.ttl <= 0:
+            return 0
+        now = int(now if now is not None else time.time())
+        cur = self.conn.execute(
+            "DELETE FROM seen WHERE last_seen < ?", (now - self.ttl,)
+        )
+        self.conn.execute(
+            "DELETE FROM fingerprints WHERE created < ?", (now - self.ttl,)
+        )
+        return cur.rowcount
+
+    def migrate_json(self, json_path: Path = SEEN_JOBS_JSON) -> int:
+        """One-time import of the old {"seen": [...]} file into scope "", which is removed afterwards."""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        try:
+            data = json.loads(json_path.read_text(encoding="utf-8"))
+            ids = list(data.get("seen", []))
+        except Exception:
+            return 0
+        # Ids are canonical URLs now; old ones were stored as scraped (titles stay as they are)
+        ids = [canonical_url(i) if i.startswith(("http://", "https://")) else i for i in ids if isinstance(i, str)]
+        now = int(time.time())
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO seen (scope, job_id, first_seen, last_seen) VALUES ('', ?, ?, ?)",
+            ((job_id, now, now) for job_id in dict.fromkeys(ids) if job_id),
+        )
+        self.conn.commit()
+        json_path.unlink()
+        return len(ids)
+
+
+def open_seen_store(scope: str = "") -> SeenStore:
+    """Open the default store, importing seen_jobs.json on first use."""
+    store = SeenStore(scope=scope)
+    store.migrate_json()
+    return store
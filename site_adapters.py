@@ -0,0 +1,240 @@
+"""
+Site adapters: choose how a job board is fetched and parsed by its URL.
+Structured sources (ATS JSON feeds, schema.org JobPosting JSON-LD) are read
+directly instead of walking the HTML.
+"""
+import html as html_lib
+import json
+import re
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlparse
+
+HTML_ACCEPT = "text/html,application/xhtml+xml"
+JSON_ACCEPT = "application/json"
+MAX_DESCRIPTION = 5000
+
+
+@dataclass(frozen=True)
+class SiteAdapter:
+    """
+    name: registry key.
+    matches(url): whether this adapter handles the board URL.
+    parse(body, url): job dicts from the fetched body; url is the board URL.
+    source_url(url): what to fetch for the board (e.g. an ATS API endpoint).
+    follow_pages: listing is paginated HTML; crawl its next pages (ATS feeds
+    already return every job in one response).
+    """
+    name: str
+    matches: Callable[[str], bool]
+    parse: Callable[[str, str], list[dict]]
+    source_url: Callable[[str], str] = lambda url: url
+    accept: str = HTML_ACCEPT
+    follow_pages: bool = False
+
+
+_ADAPTERS: list[SiteAdapter] = []
+
+
+def register_adapter(adapter: SiteAdapter) -> SiteAdapter:
+    """Add an adapter; the first registered adapter that matches a URL wins."""
+    _ADAPTERS[:] = [a for a in _ADAPTERS if a.name != adapter.name]
+    _ADAPTERS.append(adapter)
+    return adapter
+
+
+def find_adapter(url: str) -> SiteAdapter | None:
+    for adapter in _ADAPTERS:
+        if adapter.matches(url):
+            return adapter
+    return None
+
+
+def get_adapter(name: str) -> SiteAdapter | None:
+    for adapter in _ADAPTERS:
+        if adapter.name == name:
+            return adapter
+    return None
+
+
+def host_matches(*hosts: str) -> Callable[[str], bool]:
+    """Matcher for URLs on any of `hosts` or their subdomains."""
+    def matches(url: str) -> bool:
+        netloc = urlparse(url).netloc.lower().split(":")[0]
+        return any(netloc == h or netloc.endswith("." + h) for h in hosts)
+    return matches
+
+
+def html_to_text(fragment: str) -> str:
+    """Plain text of an HTML fragment (ATS descriptions are often escaped HTML)."""
+    text = html_lib.unescape(fragment or "")
+    text = re.sub(r"<(script|style)\b.*?</\1>", " ", text, flags=re.I | re.S)
+    text = re.sub(r"<[^>]+>", " ", text)
+    text = html_lib.unescape(text)
+    return re.sub(r"\s+", " ", text).strip()[:MAX_DESCRIPTION]
+
+
+def _first_path_segment(url: str) -> str:
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    return parts[0] if parts else ""
+
+
+def _job(url: str, title: str, company: str, team: str = "", description: str = "") -> dict:
+    title = (title or "").strip()
+    return {
+        "url": url,
+        "title": title,
+        "team": (team or "").strip(),
+        "company": (company or "").strip() or "Company",
+        "description": description or title,
+    }
+
+
+# --- schema.org JobPosting (JSON-LD) ---
+
+_LD_JSON_RE = re.compile(
+    r"<script[^>]+type\s*=\s*[\"']application/ld\+json[\"'][^>]*>(.*?)</script>",
+    re.I | re.S,
+)
+
+
+def _iter_ld_nodes(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_ld_nodes(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ("@graph", "itemListElement", "item"):
+            if key in node:
+                yield from _iter_ld_nodes(node[key])
+
+
+def _is_job_posting(node: dict) -> bool:
+    kind = node.get("@type")
+    kinds = kind if isinstance(kind, list) else [kind]
+    return "JobPosting" in kinds
+
+
+def job_posting_nodes(html: str):
+    """schema.org JobPosting objects from <script type="application/ld+json"> blocks."""
+    for raw in _LD_JSON_RE.findall(html):
+        try:
+            data = json.loads(raw.strip())
+        except ValueError:
+            continue
+        for node in _iter_ld_nodes(data):
+            if _is_job_posting(node):
+                yield node
+
+
+def parse_json_ld(html: str, base_url: str) -> list[dict]:
+    """JobPosting entries from <script type="application/ld+json"> blocks, without building a DOM."""
+    jobs = []
+    seen_urls = set()
+    for node in job_posting_nodes(html):
+        org = node.get("hiringOrganization") or {}
+        company = org.get("name", "") if isinstance(org, dict) else str(org)
+        url = node.get("url") or base_url
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+        jobs.append(_job(
+            url,
+            node.get("title", ""),
+            company or urlparse(base_url).netloc.replace("www.", "").split(".")[0],
+            description=html_to_text(node.get("description", "")),
+        ))
+    return [j for j in jobs if j["title"]]
+
+
+# --- ATS public JSON feeds ---
+
+def _parse_greenhouse(body: str, url: str) -> list[dict]:
+    data = json.loads(body)
+    company = _first_path_segment(url)
+    return [
+        _job(
+            j.get("absolute_url", ""),
+            j.get("title", ""),
+            company,
+            team=", ".join(d.get("name", "") for d in j.get("departments") or []),
+            description=html_to_text(j.get("content", "")),
+        )
+        for j in data.get("jobs") or []
+    ]
+
+
+def _parse_lever(body: str, url: str) -> list[dict]:
+    data = json.loads(body)
+    company = _first_path_segment(url)
+    return [
+        _job(
+            j.get("hostedUrl", ""),
+            j.get("text", ""),
+            company,
+            team=(j.get("categories") or {}).get("team", ""),
+            description=(j.get("descriptionPlain") or "")[:MAX_DESCRIPTION],
+        )
+        for j in data
+    ]
+
+
+def _parse_ashby(body: str, url: str) -> list[dict]:
+    data = json.loads(body)
+    company = _first_path_segment(url)
+    return [
+        _job(
+            j.get("jobUrl", ""),
+            j.get("title", ""),
+            company,
+            team=j.get("team") or j.get("department") or "",
+            description=(j.get("descriptionPlain") or html_to_text(j.get("descriptionHtml", "")))[:MAX_DESCRIPTION],
+        )
+        for j in data.get("jobs") or []
+        if j.get("isListed", True)
+    ]
+
+
+def _parse_workable(body: str, url: str) -> list[dict]:
+    data = json.loads(body)
+    company = data.get("name") or _first_path_segment(url)
+    return [
+        _job(
+            j.get("url") or j.get("shortlink", ""),
+            j.get("title", ""),
+            company,
+            team=j.get("department", ""),
+            description=html_to_text(j.get("description", "")),
+        )
+        for j in data.get("jobs") or []
+    ]
+
+
+register_adapter(SiteAdapter(
+    name="greenhouse",
+    matches=host_matches("boards.greenhouse.io", "job-boards.greenhouse.io"),
+    parse=_parse_greenhouse,
+    source_url=lambda url: f"https://boards-api.greenhouse.io/v1/boards/{_first_path_segment(url)}/jobs?content=true",
+    accept=JSON_ACCEPT,
+))
+register_adapter(SiteAdapter(
+    name="lever",
+    matches=host_matches("jobs.lever.co"),
+    parse=_parse_lever,
+    source_url=lambda url: f"https://api.lever.co/v0/postings/{_first_path_segment(url)}?mode=json",
+    accept=JSON_ACCEPT,
+))
+register_adapter(SiteAdapter(
+    name="ashby",
+    matches=host_matches("jobs.ashbyhq.com"),
+    parse=_parse_ashby,
+    source_url=lambda url: f"https://api.ashbyhq.com/posting-api/job-board/{_first_path_segment(url)}",
+    accept=JSON_ACCEPT,
+))
+register_adapter(SiteAdapter(
+    name="workable",
+    matches=host_matches("apply.workable.com"),
+    parse=_parse_workable,
+    source_url=lambda url: f"https://apply.workable.com/api/v1/widget/accounts/{_first_path_segment(url)}?details=true",
+    accept=JSON_ACCEPT,
+))
@@ -0,0 +1,144 @@
+"""
+Per-chat subscriptions: each chat has its own board URLs, keyword profile,
+resume profile and seen history (a scope in the seen store).
+Before the first change the single-user setup (urls.json + the saved or
+TELEGRAM_CHAT_ID chat) is presented as one subscription with scope "".
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from config import (
+    BASE_DIR,
+    DATA_DIR,
+    PROFILE_PATH,
+    PROFILES_DIR,
+    SUBSCRIPTIONS_JSON,
+    URLS_JSON,
+    DESIGN_KEYWORDS,
+    DESIGN_KEYWORD_WEIGHTS,
+    NEGATIVE_KEYWORDS,
+    DESIGN_MIN_SCORE,
+    ensure_data_dir,
+)
+from keyword_matcher import KeywordMatcher
+
+DEFAULT_URLS = ["https://wise.jobs/jobs"]
+STATE_JSON = DATA_DIR / "bot_state.json"
+
+_matchers: dict[tuple, KeywordMatcher] = {}
+
+
+@dataclass
+class Subscription:
+    """
+    keywords: None means config.DESIGN_KEYWORDS with their weights and
+    negative keywords; a chat's own keywords all weigh 1.
+    profile: resume file relative to the repo root (absolute when DATA_DIR
+    is elsewhere); "" means profile.txt.
+    """
+    chat_id: int
+    urls: list[str] = field(default_factory=lambda: list(DEFAULT_URLS))
+    keywords: list[str] | None = None
+    profile: str = ""
+    scope: str = ""
+
+    def matcher(self) -> KeywordMatcher:
+        keywords = tuple(self.keywords or ())
+        matcher = _matchers.get(keywords)
+        if matcher is None:
+            if keywords:
+                matcher = KeywordMatcher(keywords)
+            else:
+                matcher = KeywordMatcher(
+                    DESIGN_KEYWORDS, DESIGN_KEYWORD_WEIGHTS, NEGATIVE_KEYWORDS, DESIGN_MIN_SCORE
+                )
+            _matchers[keywords] = matcher
+        return matcher
+
+    def profile_path(self) -> Path:
+        return BASE_DIR / self.profile if self.profile else PROFILE_PATH
+
+
+def _legacy_chat_id() -> int | None:
+    # В CI (GitHub Actions) chat_id берём из секрета
+    env_chat = os.environ.get("TELEGRAM_CHAT_ID", "").strip()
+    if env_chat:
+        try:
+            return int(env_chat)
+        except ValueError:
+            pass
+    if not STATE_JSON.exists():
+        return None
+    try:
+        data = json.loads(STATE_JSON.read_text(encoding="utf-8"))
+        return data.get("chat_id")
+    except Exception:
+        return None
+
+
+def _legacy_urls() -> list[str]:
+    if not URLS_JSON.exists():
+        return list(DEFAULT_URLS)
+    data = json.loads(URLS_JSON.read_text(encoding="utf-8"))
+    return list(data.get("urls", []))
+
+
+def load_subscriptions() -> dict[int, Subscription]:
+    ensure_data_dir()
+    subs = {}
+    if SUBSCRIPTIONS_JSON.exists():
+        data = json.loads(SUBSCRIPTIONS_JSON.read_text(encoding="utf-8"))
+        for raw in data.get("chats", []):
+            sub = Subscription(**raw)
+            subs[sub.chat_id] = sub
+    legacy_chat = _legacy_chat_id()
+    if legacy_chat and not any(s.scope == "" for s in subs.values()) and legacy_chat not in subs:
+        subs[legacy_chat] = Subscription(chat_id=legacy_chat, urls=_legacy_urls(), scope="")
+    return subs
+
+
+def save_subscriptions(subs: dict[int, Subscription]) -> None:
+    ensure_data_dir()
+    SUBSCRIPTIONS_JSON.write_text(
+        json.dumps({"chats": [asdict(s) for s in subs.values()]}, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+
+
+def get_subscription(chat_id: int) -> Subscription | None:
+    return load_subscriptions().get(chat_id)
+
+
+def subscribe(chat_id: int) -> Subscription:
+    """Existing subscription of the chat, or a new one with the default boards."""
+    subs = load_subscriptions()
+    sub = subs.get(chat_id)
+    if sub is None:
+        # The first chat inherits the single-user history and board list
+        legacy = not any(s.scope == "" for s in subs.values())
+        sub = Subscription(
+            chat_id=chat_id,
+            urls=_legacy_urls() if legacy else list(DEFAULT_URLS),
+            scope="" if legacy else str(chat_id),
+        )
+        subs[chat_id] = sub
+        save_subscriptions(subs)
+    return sub
+
+
+def update_subscription(sub: Subscription) -> None:
+    subs = load_subscriptions()
+    subs[sub.chat_id] = sub
+    save_subscriptions(subs)
+
+
+def save_profile_text(sub: Subscription, text: str) -> Subscription:
+    """Store a chat's own resume text and point the subscription at it."""
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILES_DIR / f"{sub.chat_id}.txt"
+    path.write_text(text.strip() + "\n", encoding="utf-8")
+    sub.profile = str(path.relative_to(BASE_DIR) if path.is_relative_to(BASE_DIR) else path)
+    update_subscription(sub)
+    return sub
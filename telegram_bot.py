@@ -2,11 +2,12 @@
 Telegram bot: add/remove job board URLs, daily digest of design jobs with cover letters.
 """
 import asyncio
-import json
+import html
 import logging
-from pathlib import Path
+import time
+from contextlib import aclosing
 
-from telegram import Update, Bot
+from telegram import Update
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -14,15 +15,29 @@ from telegram.ext import (
 )
 
 from config import (
-    DATA_DIR,
-    URLS_JSON,
-    SEEN_JOBS_JSON,
     PROFILE_PATH,
     RESUME_PDF_URL,
+    OUTBOX_DIGEST,
+    LETTERS_PER_DAY,
+    LLM_STREAM,
+    TELEGRAM_API_URL,
     ensure_data_dir,
 )
-from jobs_scraper import get_new_jobs, _load_seen, _save_seen
-from yandex_gpt import generate_cover_letter
+from board_scheduler import BoardScheduler
+from check_queue import CheckQueue, CheckRun
+from http_client import get_bot, telegram_request
+from metrics import metrics, serve_metrics
+from jobs_scraper import enrich_jobs, get_new_jobs_for_subscriptions
+from outbox import LiveMessage, Outbox, OutboxItem, TelegramSender
+from relevance import score_jobs
+from subscriptions import (
+    Subscription,
+    load_subscriptions,
+    save_profile_text,
+    subscribe,
+    update_subscription,
+)
+from yandex_gpt import generate_cover_letters
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -30,65 +45,196 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-STATE_JSON = DATA_DIR / "bot_state.json"
+_delivery_locks: dict[int, asyncio.Lock] = {}
 
 
-def _load_urls() -> list[str]:
-    ensure_data_dir()
-    if not URLS_JSON.exists():
-        return ["https://wise.jobs/jobs"]
-    data = json.loads(URLS_JSON.read_text(encoding="utf-8"))
-    return list(data.get("urls", []))
+def _load_urls(chat_id: int) -> list[str]:
+    return list(subscribe(chat_id).urls)
 
 
-def _save_urls(urls: list[str]) -> None:
-    ensure_data_dir()
-    URLS_JSON.write_text(
-        json.dumps({"urls": urls}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
+def _save_urls(chat_id: int, urls: list[str]) -> None:
+    sub = subscribe(chat_id)
+    sub.urls = urls
+    update_subscription(sub)
+
+
+def _format_job_message(job: dict, letter: str) -> str:
+    """HTML message for one job; everything scraped or generated is escaped."""
+    details = "".join(
+        f"{label}: {html.escape(str(job[key]))}\n"
+        for key, label in (("location", "Локация"), ("seniority", "Уровень"), ("salary", "Зарплата"))
+        if job.get(key)
+    )
+    return (
+        f"<b>{html.escape(job.get('title', 'Vacancy'))}</b>\n"
+        f"Компания: {html.escape(job.get('company', ''))}\n"
+        f"{details}\n"
+        f"Ссылка: {html.escape(job.get('url', ''))}\n\n"
+        f"<b>Cover letter:</b>\n{html.escape(letter)}\n\n"
+        f"Резюме PDF: {html.escape(RESUME_PDF_URL)}"
     )
 
 
-def _load_chat_id() -> int | None:
-    import os
-    # В CI (GitHub Actions) chat_id берём из секрета
-    env_chat = os.environ.get("TELEGRAM_CHAT_ID", "").strip()
-    if env_chat:
-        try:
-            return int(env_chat)
-        except ValueError:
-            pass
-    if not STATE_JSON.exists():
-        return None
-    try:
-        data = json.loads(STATE_JSON.read_text(encoding="utf-8"))
-        return data.get("chat_id")
-    except Exception:
-        return None
+def _format_job_list(jobs: list[dict]) -> str:
+    lines = [f"Ещё вакансии без письма (лимит писем в день: {LETTERS_PER_DAY}), от лучших к остальным:"]
+    for j in jobs:
+        title = html.escape(j.get("title", "Vacancy"))
+        company = html.escape(j.get("company", ""))
+        url = html.escape(j.get("url", ""), quote=True)
+        lines.append(f"• <a href=\"{url}\">{title}</a>" + (f" — {company}" if company else ""))
+    return "\n".join(lines)
 
 
-def _save_chat_id(chat_id: int) -> None:
-    ensure_data_dir()
-    data = {}
-    if STATE_JSON.exists():
-        try:
-            data = json.loads(STATE_JSON.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-    data["chat_id"] = chat_id
-    STATE_JSON.write_text(json.dumps(data, indent=2), encoding="utf-8")
+def _profile_text(path) -> str:
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError:
+        return ""
+
+
+def _plan_letters(outbox: Outbox, chat_id: int, items: list[OutboxItem], profile: str) -> list[OutboxItem]:
+    """
+    Items ordered from the best to the worst match for the profile. With
+    LETTERS_PER_DAY, the items over the chat's budget for today become one
+    list message instead; the rest, which get letters, are returned. The
+    budget is only charged as letters are stored (see _write_and_send), so
+    jobs given back by a cancelled run do not use it up.
+    """
+    scores = score_jobs([item.job for item in items], profile)
+    items = [items[i] for i in sorted(range(len(items)), key=lambda i: -scores[i])]
+    if LETTERS_PER_DAY > 0 and items:
+        today = time.strftime("%Y-%m-%d")
+        room = max(0, LETTERS_PER_DAY - outbox.letters_used(chat_id, today))
+        items, over_budget = items[:room], items[room:]
+        if over_budget:
+            outbox.replace_with_text(
+                chat_id, [item.id for item in over_budget], _format_job_list([item.job for item in over_budget])
+            )
+    return items
+
+
+def _store_new_jobs(by_chat: dict[int, list[dict]]) -> None:
+    """
+    Put every chat's new jobs in the outbox. Call right after they were marked
+    seen, before anything slow: from here on a crash delays them, never loses them.
+    """
+    with Outbox() as outbox:
+        for chat_id, jobs in by_chat.items():
+            outbox.add_jobs(chat_id, jobs)
+
+
+async def _deliver_jobs(
+    bot,
+    sub: Subscription,
+    error_letter: str,
+    progress=None,
+    stream: bool = False,
+) -> tuple[int, int]:
+    """
+    Write letters for the jobs waiting in the chat's outbox and send them,
+    together with anything left undelivered by earlier runs. Returns
+    (delivered, total) in messages. progress(done, total) is called after each
+    letter. Waiting jobs are completed from their detail pages, then ranked
+    against the profile so the best matches get letters first; with
+    LETTERS_PER_DAY, jobs over the chat's daily budget go out as one list.
+    With stream (and no digest), each letter is shown while it is being written.
+    """
+    chat_id = sub.chat_id
+    sender = TelegramSender.for_bot(bot)
+    # /check and the daemon deliver through here: one delivery per chat at a time
+    lock = _delivery_locks.setdefault(chat_id, asyncio.Lock())
+    async with lock:
+        with Outbox() as outbox:
+            claimed = outbox.claim_waiting(chat_id)
+            try:
+                return await _write_and_send(outbox, sender, sub, claimed, error_letter, progress, stream)
+            finally:
+                # Claimed jobs without a letter (cancelled, failed run) wait for the next delivery
+                outbox.release([item.id for item in claimed])
+
+
+async def _write_and_send(
+    outbox: Outbox,
+    sender: TelegramSender,
+    sub: Subscription,
+    items: list[OutboxItem],
+    error_letter: str,
+    progress,
+    stream: bool,
+) -> tuple[int, int]:
+    chat_id = sub.chat_id
+    profile_path = sub.profile_path()
+    for item, job in zip(items, await enrich_jobs([item.job for item in items], sub.urls)):
+        item.job = job
+    items = _plan_letters(outbox, chat_id, items, _profile_text(profile_path or PROFILE_PATH))
+    total = len(items) + len(outbox.ready(chat_id))
+    by_job = {id(item.job): item for item in items}
+    delivered = 0
+    done = 0
+    live = {}
+    closed = False
+
+    def show_partial(j, text):
+        # Chunks already queued by stream threads may arrive after teardown
+        if closed:
+            return
+        if id(j) not in live:
+            live[id(j)] = LiveMessage(sender, chat_id, parse_mode="HTML", disable_web_page_preview=True)
+        live[id(j)].update(_format_job_message(j, text + " …"))
+
+    on_partial = show_partial if stream and not OUTBOX_DIGEST else None
+    # Letters are generated concurrently and sent as soon as each one is ready
+    letters = generate_cover_letters([item.job for item in items], profile_path=profile_path, on_partial=on_partial)
+    try:
+        async with aclosing(letters):
+            async for j, letter, error in letters:
+                done += 1
+                if progress:
+                    progress(done, len(items))
+                if error is not None:
+                    logger.warning("Ya GPT error for %s: %s", j.get("url", ""), error)
+                    letter = error_letter
+                item_id = by_job[id(j)].id
+                text = _format_job_message(j, letter)
+                message = live.pop(id(j), None)
+                if not outbox.set_text(item_id, text):
+                    logger.warning("Outbox item %s was reclaimed by another delivery, not sending it", item_id)
+                    continue
+                if LETTERS_PER_DAY > 0 and error is None:
+                    outbox.use_letters(chat_id, time.strftime("%Y-%m-%d"), 1)
+                if message is not None:
+                    try:
+                        await message.finish(text)
+                    except Exception as e:
+                        # Left ready in the outbox, the flush below retries it
+                        logger.warning("Send error: %s", e)
+                        message = None
+                if message is not None:
+                    outbox.mark_sent([item_id])
+                    delivered += 1
+                elif not OUTBOX_DIGEST:
+                    delivered += await sender.flush(outbox, chat_id)
+    finally:
+        closed = True
+        for message in live.values():
+            message.cancel()
+    delivered += await sender.flush(outbox, chat_id)
+    return delivered, total
 
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if update.effective_chat:
-        _save_chat_id(update.effective_chat.id)
+        subscribe(update.effective_chat.id)
     await update.message.reply_text(
         "Привет. Я буду присылать подборку design-вакансий с готовым cover letter под каждую.\n\n"
         "Команды:\n"
         "/addurl <ссылка> — добавить страницу с вакансиями\n"
         "/removeurl <ссылка> — удалить ссылку\n"
         "/listurls — показать все ссылки\n"
+        "/keywords [слова через запятую] — ключевые слова фильтра\n"
+        "/profile <текст> — своё резюме для писем\n"
         "/check — проверить сейчас и прислать новые вакансии\n"
+        "/cancel — остановить текущую проверку\n"
         "/help — справка"
     )
 
@@ -100,12 +246,12 @@ async def cmd_addurl(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     url = context.args[0].strip()
     if not url.startswith("http"):
         url = "https://" + url
-    urls = _load_urls()
+    urls = _load_urls(update.effective_chat.id)
     if url in urls:
         await update.message.reply_text("Эта ссылка уже в списке.")
         return
     urls.append(url)
-    _save_urls(urls)
+    _save_urls(update.effective_chat.id, urls)
     await update.message.reply_text(f"Добавлено: {url}\nВсего ссылок: {len(urls)}")
 
 
@@ -116,17 +262,17 @@ async def cmd_removeurl(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     url = context.args[0].strip()
     if not url.startswith("http"):
         url = "https://" + url
-    urls = _load_urls()
+    urls = _load_urls(update.effective_chat.id)
     if url not in urls:
         await update.message.reply_text("Такой ссылки нет в списке.")
         return
     urls.remove(url)
-    _save_urls(urls)
+    _save_urls(update.effective_chat.id, urls)
     await update.message.reply_text(f"Удалено: {url}\nОсталось ссылок: {len(urls)}")
 
 
 async def cmd_listurls(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    urls = _load_urls()
+    urls = _load_urls(update.effective_chat.id)
     if not urls:
         await update.message.reply_text("Список пуст. Добавь ссылку: /addurl <url>")
         return
@@ -134,108 +280,179 @@ async def cmd_listurls(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text(text)
 
 
-async def cmd_check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.message.reply_text("Проверяю вакансии…")
-    urls = _load_urls()
-    if not urls:
-        await update.message.reply_text("Нет ссылок. Добавь: /addurl <url>")
+async def cmd_keywords(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/keywords — show, /keywords a, b — replace, /keywords reset — back to the defaults."""
+    sub = subscribe(update.effective_chat.id)
+    text = " ".join(context.args or []).strip()
+    if not text:
+        current = ", ".join(sub.keywords) if sub.keywords else "по умолчанию (design)"
+        await update.message.reply_text(
+            f"Ключевые слова: {current}\n\nИзменить: /keywords ux, ui designer, illustrator\nСбросить: /keywords reset"
+        )
+        return
+    if text.lower() == "reset":
+        sub.keywords = None
+    else:
+        sub.keywords = [k.strip().lower() for k in text.split(",") if k.strip()] or None
+    update_subscription(sub)
+    current = ", ".join(sub.keywords) if sub.keywords else "по умолчанию (design)"
+    await update.message.reply_text(f"Ключевые слова: {current}")
+
+
+async def cmd_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Replace the chat's resume text used for cover letters."""
+    sub = subscribe(update.effective_chat.id)
+    text = (update.message.text or "").partition(" ")[2].strip()
+    if not text:
+        source = sub.profile or "profile.txt"
+        await update.message.reply_text(
+            f"Резюме для писем: {source}\n\nЗаменить: /profile <текст резюме>"
+        )
         return
+    save_profile_text(sub, text)
+    await update.message.reply_text("Резюме сохранено, следующие письма будут по нему.")
+
+
+async def _run_check(run: CheckRun) -> None:
+    """One /check: scrape, then send each vacancy as soon as its letter is ready."""
+    sub = subscribe(run.chat_id)
+    if not sub.urls:
+        run.set_status("Нет ссылок. Добавь: /addurl <url>")
+        return
+    run.set_status(f"Проверяю вакансии… 0/{len(sub.urls)} страниц")
     try:
-        jobs = get_new_jobs(urls)
+        by_chat = await get_new_jobs_for_subscriptions(
+            [sub],
+            progress=lambda done, total: run.set_status(f"Проверяю вакансии… {done}/{total} страниц"),
+            enrich=False,
+        )
     except Exception as e:
         logger.exception("Scraper error")
-        await update.message.reply_text(f"Ошибка при сборе вакансий: {e}")
+        run.set_status(f"Ошибка при сборе вакансий: {e}")
         return
-    if not jobs:
-        await update.message.reply_text("Новых design-вакансий не найдено.")
+    await asyncio.to_thread(_store_new_jobs, by_chat)
+    sent, total = await _deliver_jobs(
+        run.bot,
+        sub,
+        "(Не удалось сгенерировать письмо. Проверь YANDEX_API_KEY.)",
+        progress=lambda done, n: run.set_status(f"Найдено вакансий: {n}. Пишу письма… {done}/{n}"),
+        stream=LLM_STREAM,
+    )
+    if not total:
+        run.set_status("Новых вакансий не найдено.")
         return
-    sent = 0
-    for j in jobs:
-        title = j.get("title", "Vacancy")
-        url_job = j.get("url", "")
-        company = j.get("company", "")
-        desc = (j.get("description") or title)[:2000]
-        try:
-            letter = generate_cover_letter(title, desc, company)
-        except Exception as e:
-            logger.warning("Ya GPT error for %s: %s", url_job, e)
-            letter = "(Не удалось сгенерировать письмо. Проверь YANDEX_API_KEY.)"
-        msg = (
-            f"<b>{title}</b>\n"
-            f"Компания: {company}\n\n"
-            f"Ссылка: {url_job}\n\n"
-            f"<b>Cover letter:</b>\n{letter}\n\n"
-            f"Резюме PDF: {RESUME_PDF_URL}"
-        )
-        try:
-            await update.message.reply_text(msg, parse_mode="HTML", disable_web_page_preview=True)
-            sent += 1
-        except Exception as e:
-            logger.warning("Send error: %s", e)
-    if sent < len(jobs):
-        await update.message.reply_text(f"Отправлено {sent} из {len(jobs)} вакансий.")
+    if sent < total:
+        summary = f"Отправлено {sent} из {total} вакансий. Остальные отправлю при следующей проверке."
+    else:
+        summary = f"Готово. Отправлено вакансий: {sent}."
+    run.set_status(summary)
+    await TelegramSender.for_bot(run.bot).send(run.chat_id, summary)
+
+
+def _check_queue(context: ContextTypes.DEFAULT_TYPE) -> CheckQueue:
+    return context.application.bot_data["check_queue"]
+
+
+async def cmd_check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Queue a check and return at once; progress is shown in one edited message."""
+    chat_id = update.effective_chat.id
+    queue = _check_queue(context)
+    if queue.busy(chat_id):
+        await update.message.reply_text("Проверка уже идёт — пришлю результаты, когда закончу. /cancel — остановить.")
+        return
+    status = await update.message.reply_text("Проверяю вакансии…")
+    queue.submit(CheckRun(chat_id=chat_id, bot=context.bot, status_message=status))
+
+
+async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if _check_queue(context).cancel(update.effective_chat.id):
+        await update.message.reply_text("Останавливаю проверку.")
     else:
-        await update.message.reply_text(f"Готово. Отправлено вакансий: {sent}.")
+        await update.message.reply_text("Сейчас ничего не проверяется.")
 
 
 async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
         "Бот раз в день (или по /check) проверяет твои ссылки на страницы с вакансиями, "
         "фильтрует design/product/graphic design и присылает тебе каждую вакансию с готовым cover letter и ссылкой на резюме.\n\n"
-        "Добавляй и удаляй ссылки через /addurl и /removeurl. Резюме для писем берётся из profile.txt, письма генерирует Yandex GPT."
+        "Добавляй и удаляй ссылки через /addurl и /removeurl, меняй фильтр через /keywords. "
+        "Резюме для писем берётся из profile.txt или из присланного через /profile, письма генерирует Yandex GPT. "
+        "У каждого чата свои ссылки, фильтр и история отправленных вакансий."
     )
 
 
 def run_daily_send(bot_token: str) -> None:
-    """Fetch new jobs and send to saved chat_id. Use from cron or scheduler."""
-    chat_id = _load_chat_id()
-    if not chat_id:
+    """
+    Fetch new jobs for every subscribed chat and send them. Boards shared by
+    several chats are fetched once. Use from cron or scheduler.
+    """
+    subs = [s for s in load_subscriptions().values() if s.urls]
+    if not subs:
         logger.warning("No chat_id saved; user should /start the bot first.")
         return
-    urls = _load_urls()
-    if not urls:
-        return
-    try:
-        jobs = get_new_jobs(urls)
-    except Exception as e:
-        logger.exception("Daily scraper error: %s", e)
-        return
-    if not jobs:
-        return
 
     async def send_all():
-        bot = Bot(token=bot_token)
-        for j in jobs:
-            title = j.get("title", "Vacancy")
-            url_job = j.get("url", "")
-            company = j.get("company", "")
-            desc = (j.get("description") or title)[:2000]
-            try:
-                letter = generate_cover_letter(title, desc, company)
-            except Exception as e:
-                logger.warning("Ya GPT error: %s", e)
-                letter = "(Ошибка генерации письма.)"
-            msg = (
-                f"<b>{title}</b>\n"
-                f"Компания: {company}\n\n"
-                f"Ссылка: {url_job}\n\n"
-                f"<b>Cover letter:</b>\n{letter}\n\n"
-                f"Резюме PDF: {RESUME_PDF_URL}"
-            )
-            try:
-                await bot.send_message(
-                    chat_id=chat_id,
-                    text=msg,
-                    parse_mode="HTML",
-                    disable_web_page_preview=True,
+        try:
+            by_chat = await get_new_jobs_for_subscriptions(subs, enrich=False)
+        except Exception as e:
+            logger.exception("Daily scraper error: %s", e)
+            return
+        # Every chat's jobs are stored before the first letter is written
+        await asyncio.to_thread(_store_new_jobs, by_chat)
+        bot = get_bot(bot_token)
+        for sub in subs:
+            sent, total = await _deliver_jobs(bot, sub, "(Ошибка генерации письма.)")
+            if sent < total:
+                logger.warning(
+                    "Chat %s: delivered %d of %d vacancies; the rest stay in the outbox",
+                    sub.chat_id, sent, total,
                 )
-            except Exception as e:
-                logger.warning("Send error: %s", e)
-
-    asyncio.run(send_all())
 
+    try:
+        asyncio.run(send_all())
+    finally:
+        metrics.write_report()
+
+
+async def _post_init(app: Application) -> None:
+    queue = CheckQueue(_run_check)
+    queue.start()
+    app.bot_data["check_queue"] = queue
+    if app.bot_data.get("daemon"):
+
+        async def deliver(sub):
+            sent, total = await _deliver_jobs(app.bot, sub, "(Ошибка генерации письма.)", stream=LLM_STREAM)
+            if sent < total:
+                logger.warning(
+                    "Chat %s: delivered %d of %d vacancies; the rest stay in the outbox",
+                    sub.chat_id, sent, total,
+                )
 
-def main() -> None:
+        scheduler = BoardScheduler(deliver, busy=queue.busy)
+        scheduler.start()
+        app.bot_data["board_scheduler"] = scheduler
+        app.bot_data["metrics_server"] = serve_metrics()
+
+
+async def _post_shutdown(app: Application) -> None:
+    scheduler = app.bot_data.get("board_scheduler")
+    if scheduler:
+        await scheduler.stop()
+    server = app.bot_data.get("metrics_server")
+    if server:
+        server.shutdown()
+        server.server_close()
+    metrics.write_report()
+    queue = app.bot_data.get("check_queue")
+    if queue:
+        await queue.stop()
+
+
+def main(daemon: bool = False) -> None:
+    """
+    Run the bot. With daemon=True (python telegram_bot.py --daemon) the same
+    process also polls every subscribed board on its own schedule.
+    """
     import os
     try:
         from dotenv import load_dotenv
@@ -247,15 +464,28 @@ def main() -> None:
         print("Set TELEGRAM_BOT_TOKEN in .env")
         return
     ensure_data_dir()
-    app = Application.builder().token(token).build()
+    app = (
+        Application.builder()
+        .token(token)
+        .base_url(TELEGRAM_API_URL)
+        .request(telegram_request())
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
+    app.bot_data["daemon"] = daemon
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("addurl", cmd_addurl))
     app.add_handler(CommandHandler("removeurl", cmd_removeurl))
     app.add_handler(CommandHandler("listurls", cmd_listurls))
+    app.add_handler(CommandHandler("keywords", cmd_keywords))
+    app.add_handler(CommandHandler("profile", cmd_profile))
     app.add_handler(CommandHandler("check", cmd_check))
+    app.add_handler(CommandHandler("cancel", cmd_cancel))
     app.add_handler(CommandHandler("help", cmd_help))
     app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+    main(daemon="--daemon" in sys.argv[1:])
@@ -1,7 +1,12 @@
 """
 Generate cover letters using Yandex GPT (Yandex Cloud LLM API).
 """
-import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
 import requests
 from config import (
     PROFILE_PATH,
@@ -10,15 +15,56 @@ from config import (
     YANDEX_IAM_TOKEN,
     YANDEX_FOLDER_ID,
     YANDEX_MODEL_URI,
+    LLM_CONCURRENCY,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_RETRIES,
+    LLM_ASYNC,
+    LLM_POLL_SECONDS,
+    PROMPT_PROFILE_CHARS,
+    PROMPT_DESCRIPTION_CHARS,
+    YANDEX_LLM_API_URL,
+    YANDEX_OPERATION_API_URL,
 )
+from http_client import LLM_TIMEOUT, blocking_pool, get_session
+from letter_cache import letter_cache, letter_key
+from metrics import metrics, usage_tokens
+from prompt_builder import DIGEST_INSTRUCTION, select_profile, trim_description
 
-COMPLETION_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+logger = logging.getLogger(__name__)
+
+COMPLETION_URL = f"{YANDEX_LLM_API_URL}/foundationModels/v1/completion"
+ASYNC_COMPLETION_URL = f"{YANDEX_LLM_API_URL}/foundationModels/v1/completionAsync"
+OPERATION_URL = f"{YANDEX_OPERATION_API_URL}/operations/{{}}"
+ASYNC_MAX_WAIT = 600.0  # seconds a deferred completion may take before it counts as failed
+MAX_TOKENS = 1024
+DIGEST_MAX_TOKENS = 400
+TEMPERATURE = 0.4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0  # seconds; a larger Retry-After would hold a worker and its pool slot
+
+
+_text_cache: dict = {}
 
 
 def _load_text(path) -> str:
-    if path and path.exists():
-        return path.read_text(encoding="utf-8").strip()
-    return ""
+    """Read a prompt file; re-read only when its mtime or size changes."""
+    if not path:
+        return ""
+    try:
+        st = path.stat()
+    except OSError:
+        return ""
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _text_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    text = path.read_text(encoding="utf-8").strip()
+    _text_cache[path] = (stamp, text)
+    return text
+
+
+def _model_uri() -> str:
+    return YANDEX_MODEL_URI or f"gpt://{YANDEX_FOLDER_ID}/aliceai-llm/latest"
 
 
 def _auth_header() -> dict:
@@ -29,16 +75,114 @@ def _auth_header() -> dict:
     return {}
 
 
-def generate_cover_letter(
+def _retry_delay(attempt: int, response=None) -> float:
+    """Retry-After if the server sent one (at most MAX_BACKOFF), else exponential backoff with jitter."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(MAX_BACKOFF, float(retry_after))
+    return min(MAX_BACKOFF, 2.0 ** attempt) * (0.5 + random.random())
+
+
+def _open_completion(
+    payload: dict,
+    headers: dict,
+    retries: int = LLM_MAX_RETRIES,
+    stream: bool = False,
+    url: str = COMPLETION_URL,
+) -> requests.Response:
+    """POST to url, retrying 429/5xx and connection errors; returns the successful response."""
+    for attempt in range(retries + 1):
+        try:
+            r = get_session("llm").post(
+                url, json=payload, headers=headers, timeout=LLM_TIMEOUT, stream=stream
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            metrics.count("llm_retries")
+            time.sleep(_retry_delay(attempt))
+            continue
+        if r.status_code in RETRY_STATUSES and attempt < retries:
+            r.close()
+            metrics.count("llm_throttled" if r.status_code == 429 else "llm_retries")
+            time.sleep(_retry_delay(attempt, r))
+            continue
+        r.raise_for_status()
+        metrics.count("llm_requests")
+        return r
+
+
+def _post_completion(payload: dict, headers: dict, retries: int = LLM_MAX_RETRIES) -> dict:
+    data = _open_completion(payload, headers, retries).json()
+    usage_tokens((data.get("result") or {}).get("usage"))
+    return data
+
+
+_digests: dict = {}
+_digest_lock = threading.Lock()
+
+
+def profile_digest(profile: str) -> str:
+    """
+    Short summary of a long profile, written once per profile version and kept
+    in the letter cache. "" when the profile fits PROMPT_PROFILE_CHARS or the
+    summary cannot be written (the prompt then uses profile sections only).
+    """
+    if PROMPT_PROFILE_CHARS <= 0 or len(profile) <= PROMPT_PROFILE_CHARS:
+        return ""
+    model_uri = _model_uri()
+    key = _digest_key(profile, model_uri)
+    with _digest_lock:
+        if key in _digests:
+            return _digests[key]
+        digest = letter_cache.get(key)
+        if digest is None:
+            payload = {
+                "folderId": YANDEX_FOLDER_ID,
+                "modelUri": model_uri,
+                "completionOptions": {"temperature": 0.0, "maxTokens": DIGEST_MAX_TOKENS},
+                "messages": [
+                    {"role": "system", "text": DIGEST_INSTRUCTION},
+                    {"role": "user", "text": profile},
+                ],
+            }
+            try:
+                digest = _alternative_text(_post_completion(payload, _request_headers(), retries=1)).strip()
+            except Exception as e:
+                # Not retried again in this process; letters still get the matching sections
+                logger.warning("Profile digest failed: %s", e)
+                digest = ""
+            if digest:
+                letter_cache.put(key, digest)
+        _digests[key] = digest
+        return digest
+
+
+def _digest_key(profile: str, model_uri: str) -> str:
+    return letter_key(DIGEST_INSTRUCTION, profile, model_uri, 0.0, "", "", "")
+
+
+def _profile_prompt(profile: str, job_text: str) -> str:
+    """Whole profile when it is short, else the cached digest plus the sections that match the job."""
+    if PROMPT_PROFILE_CHARS <= 0 or len(profile) <= PROMPT_PROFILE_CHARS:
+        return profile
+    # Only a digest already written is used here, so building a prompt never waits on the API
+    digest = _digests.get(_digest_key(profile, _model_uri()), "")
+    sections = select_profile(profile, job_text, PROMPT_PROFILE_CHARS, keep_intro=not digest)
+    if not digest:
+        return sections
+    return f"Summary:\n{digest}\n\nMost relevant experience:\n{sections}"
+
+
+def _build_messages(
     job_title: str,
     job_description: str,
     company: str = "",
-) -> str:
-    """
-    Call Yandex GPT with instruction + profile + job details; return cover letter text.
-    """
+    profile_path=PROFILE_PATH,
+) -> list[dict]:
     instruction = _load_text(INSTRUCTION_PATH)
-    profile = _load_text(PROFILE_PATH)
+    profile = _profile_prompt(_load_text(profile_path), f"{job_title} {job_description}")
     user_content = f"""Candidate profile (use only this for facts):
 
 {profile}
@@ -51,34 +195,280 @@ Job to apply for:
 - Description (excerpt): {job_description[:3000]}
 
 Write a short cover letter for this job in English. Output only the letter text."""
+    return [
+        {"role": "system", "text": instruction},
+        {"role": "user", "text": user_content},
+    ]
+
+
+def _estimate_tokens(messages: list[dict]) -> int:
+    """Rough prompt + completion size for rate limiting (~4 chars per token)."""
+    return sum(len(m["text"]) for m in messages) // 4 + MAX_TOKENS
+
+
+def generate_cover_letter(
+    job_title: str,
+    job_description: str,
+    company: str = "",
+    profile_path=PROFILE_PATH,
+) -> str:
+    """
+    Call Yandex GPT with instruction + profile + job details; return cover letter text.
+    Letters are cached by content, so a job seen again costs no completion.
+    """
+    key, payload = _completion_request(job_title, job_description, company, profile_path)
+    cached = letter_cache.get(key)
+    if cached is not None:
+        return cached
+    letter = _alternative_text(_post_completion(payload, _request_headers())).strip()
+    if letter:
+        letter_cache.put(key, letter)
+    return letter
+
+
+def stream_cover_letter(
+    job_title: str,
+    job_description: str,
+    company: str = "",
+    profile_path=PROFILE_PATH,
+    cancel: threading.Event | None = None,
+):
+    """
+    Streaming generate_cover_letter: yields the letter written so far each
+    time the completion grows; the last value is the whole letter.
+    A cached letter is yielded at once. Once `cancel` is set, the stream is
+    closed at the next chunk and nothing more is yielded or cached.
+    """
+    key, payload = _completion_request(job_title, job_description, company, profile_path)
+    cached = letter_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    payload["completionOptions"]["stream"] = True
+    text = ""
+    usage = None
+    # One JSON object per line; every chunk carries the whole text generated so far
+    with _open_completion(payload, _request_headers(), stream=True) as r:
+        for line in r.iter_lines():
+            if cancel is not None and cancel.is_set():
+                return
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(f"Completion stream failed: {data['error']}")
+            usage = (data.get("result") or {}).get("usage") or usage
+            chunk = _alternative_text(data)
+            if chunk and chunk != text:
+                text = chunk
+                yield text
+    usage_tokens(usage)
+    letter = text.strip()
+    if letter:
+        letter_cache.put(key, letter)
+        if letter != text:
+            yield letter
+
+
+def start_cover_letter(
+    job_title: str,
+    job_description: str,
+    company: str = "",
+    profile_path=PROFILE_PATH,
+) -> tuple[str, str | None, str]:
+    """
+    Submit a deferred completion (completionAsync). Returns (letter key,
+    cached letter, operation id): a cached letter needs no operation, its id is "".
+    """
+    key, payload = _completion_request(job_title, job_description, company, profile_path)
+    cached = letter_cache.get(key)
+    if cached is not None:
+        return key, cached, ""
+    operation = _post_completion_async(payload)
+    return key, None, operation["id"]
+
+
+def _post_completion_async(payload: dict) -> dict:
+    return _open_completion(payload, _request_headers(), url=ASYNC_COMPLETION_URL).json()
+
+
+def poll_cover_letter(key: str, operation_id: str) -> str | None:
+    """The letter of a deferred completion, None while it is still being written."""
+    try:
+        r = get_session("llm").get(OPERATION_URL.format(operation_id), headers=_auth_header(), timeout=LLM_TIMEOUT)
+    except (requests.ConnectionError, requests.Timeout):
+        return None
+    if r.status_code in RETRY_STATUSES:
+        return None
+    r.raise_for_status()
+    operation = r.json()
+    if not operation.get("done"):
+        return None
+    if operation.get("error"):
+        raise RuntimeError(f"Completion failed: {operation['error']}")
+    # The operation's response is the completion result itself: response.alternatives[0]...
+    response = operation.get("response") or {}
+    usage_tokens(response.get("usage"))
+    letter = _alternative_text({"result": response}).strip()
+    if letter:
+        letter_cache.put(key, letter)
+    return letter
+
 
+def _completion_request(job_title, job_description, company, profile_path) -> tuple[str, dict]:
+    """(letter cache key, completion payload) for one job."""
+    profile_digest(_load_text(profile_path))
+    messages = _build_messages(job_title, job_description, company, profile_path)
+    model_uri = _model_uri()
+    key = letter_key(
+        _load_text(INSTRUCTION_PATH),
+        _load_text(profile_path),
+        model_uri,
+        TEMPERATURE,
+        job_title,
+        company,
+        job_description,
+    )
     # Yandex completion API: folderId, modelUri, completionOptions, messages
-    model_uri = YANDEX_MODEL_URI or f"gpt://{YANDEX_FOLDER_ID}/aliceai-llm/latest"
     payload = {
         "folderId": YANDEX_FOLDER_ID,
         "modelUri": model_uri,
         "completionOptions": {
-            "temperature": 0.4,
-            "maxTokens": 1024,
+            "temperature": TEMPERATURE,
+            "maxTokens": MAX_TOKENS,
         },
-        "messages": [
-            {"role": "system", "text": instruction},
-            {"role": "user", "text": user_content},
-        ],
+        "messages": messages,
     }
-    headers = {
+    return key, payload
+
+
+def _request_headers() -> dict:
+    return {
         "Content-Type": "application/json",
         **_auth_header(),
     }
-    r = requests.post(COMPLETION_URL, json=payload, headers=headers, timeout=60)
-    r.raise_for_status()
-    data = r.json()
+
+
+def _alternative_text(data: dict) -> str:
     # Response shape: result.alternatives[0].message.text
     result = data.get("result") or {}
     alternatives = result.get("alternatives") or []
     if not alternatives:
         return ""
-    return (alternatives[0].get("message") or {}).get("text", "").strip()
+    return (alternatives[0].get("message") or {}).get("text", "")
+
+
+class TokenRateLimiter:
+    """Async token bucket: at most `per_minute` tokens per minute (0 = unlimited)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        if self.rate <= 0:
+            return
+        tokens = min(float(tokens), self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+def _job_prompt_args(job: dict) -> tuple[str, str, str]:
+    title = job.get("title", "Vacancy")
+    desc = trim_description(job.get("description") or title, PROMPT_DESCRIPTION_CHARS)
+    # Filled in from the detail page when it had them
+    facts = [f"{k.capitalize()}: {job[k]}" for k in ("location", "seniority", "salary") if job.get(k)]
+    if facts:
+        desc = "\n".join(facts) + "\n" + desc
+    return title, desc, job.get("company", "")
+
+
+async def generate_cover_letters(
+    jobs: list[dict],
+    concurrency: int = LLM_CONCURRENCY,
+    tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+    profile_path=None,
+    on_partial=None,
+    deferred: bool = LLM_ASYNC,
+):
+    """
+    Generate letters for many jobs at once. Yields (job, letter, error) in order
+    of completion; error is the exception when generation failed, letter is then "".
+    At most `concurrency` completions are in flight. profile_path defaults to profile.txt.
+    With on_partial, completions are streamed and on_partial(job, text_so_far)
+    is called on the event loop as each letter grows; streams still running
+    are closed when the generator is closed. With deferred (and no
+    on_partial), letters are submitted as async operations and polled; only
+    submissions count against `concurrency`.
+    """
+    profile_path = profile_path or PROFILE_PATH
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(max(1, concurrency))
+    limiter = TokenRateLimiter(tokens_per_minute)
+    closed = threading.Event()
+
+    with blocking_pool(concurrency) as pool:
+
+        def stream(job, title, desc, company):
+            letter = ""
+            for letter in stream_cover_letter(title, desc, company, profile_path, cancel=closed):
+                loop.call_soon_threadsafe(on_partial, job, letter)
+            return letter.strip()
+
+        async def wait_operation(key, operation_id):
+            deadline = time.monotonic() + ASYNC_MAX_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LLM_POLL_SECONDS)
+                letter = await loop.run_in_executor(pool, poll_cover_letter, key, operation_id)
+                if letter is not None:
+                    return letter
+            raise TimeoutError(f"Completion {operation_id} not done in {ASYNC_MAX_WAIT:.0f} s")
+
+        async def worker(job):
+            title, desc, company = _job_prompt_args(job)
+            operation_id = ""
+            try:
+                async with limit:
+                    with metrics.span("letter_wait"):
+                        await limiter.acquire(_estimate_tokens(_build_messages(title, desc, company, profile_path)))
+                    t0 = time.perf_counter()
+                    if on_partial is not None:
+                        letter = await loop.run_in_executor(pool, stream, job, title, desc, company)
+                    elif deferred:
+                        key, letter, operation_id = await loop.run_in_executor(
+                            pool, start_cover_letter, title, desc, company, profile_path
+                        )
+                    else:
+                        letter = await loop.run_in_executor(
+                            pool, generate_cover_letter, title, desc, company, profile_path
+                        )
+                if operation_id:
+                    letter = await wait_operation(key, operation_id)
+            except Exception as e:
+                metrics.count("letter_errors")
+                return job, "", e
+            metrics.observe("letter", time.perf_counter() - t0)
+            return job, letter, None
+
+        tasks = [asyncio.create_task(worker(j)) for j in jobs]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            # Pool threads cannot be cancelled: tell running streams to stop reading
+            closed.set()
+            for t in tasks:
+                t.cancel()
 
 
 if __name__ == "__main__":
@@ -87,5 +477,7 @@ if __name__ == "__main__":
     instruction = _load_text(INSTRUCTION_PATH)
     print("Profile length:", len(profile))
     print("Instruction length:", len(instruction))
+    print("Profile in a prompt:", len(_profile_prompt(profile, "Senior product designer")))
+    print("Letter cache:", letter_cache.stats())
     if not (YANDEX_API_KEY or YANDEX_IAM_TOKEN):
         print("Set YANDEX_API_KEY or YANDEX_IAM_TOKEN to test generation.")